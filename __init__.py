@@ -15,19 +15,35 @@ __version__ = '1.0.1'
 
 SW_LIBSDIR  = '.libs'
 
+SW_CACHEKEY_LEN = 16
+
 # environment varibles
 
+SW_BUILDER       = 'SW_BUILDER'
+SW_BUILDLOG      = 'SW_BUILDLOG'
+SW_CACHE_DIR     = 'SW_CACHE_DIR'
 SW_KEEPTEMP      = 'SW_KEEPTEMP'
 SW_LIBRARY_PATH  = 'SW_LIBRARY_PATH'
 SW_PRINTICODE    = 'SW_PRINTICODE'
 SW_PRINTRULETREE = 'SW_PRINTRULETREE'
 SW_PRINTSUMS     = 'SW_PRINTSUMS'
+SW_WISDOM        = 'SW_WISDOM'
 SW_WORKDIR       = 'SW_WORKDIR'
 
 # options
 
+SW_OPT_ASYNCBUILD       = 'asyncbuild'
+SW_OPT_AUTOTUNE         = 'autotune'
+SW_OPT_BUILDER          = 'builder'
+SW_OPT_BUFFERPOOL       = 'bufferpool'
+SW_OPT_BUILDLOG         = 'buildlog'
 SW_OPT_COLMAJOR         = 'colmajor'
+SW_OPT_COMPILEPROFILE   = 'compileprofile'
+SW_OPT_FUSESCALE        = 'fusescale'
+SW_OPT_INPLACE          = 'inplace'
 SW_OPT_KEEPTEMP         = 'keeptemp'
+SW_OPT_MAXBATCH         = 'maxbatch'
+SW_OPT_MAXWAIT          = 'maxwait'
 SW_OPT_METADATA         = 'metadata'
 SW_OPT_MPI              = 'mpi'
 SW_OPT_PLATFORM         = 'platform'
@@ -35,6 +51,37 @@ SW_OPT_PRINTICODE       = 'printicode'
 SW_OPT_PRINTRULETREE    = 'printruletree'
 SW_OPT_PRINTSUMS        = 'printsums'
 SW_OPT_REALCTYPE        = 'realctype'
+SW_OPT_REENTRANT        = 'reentrant'
+SW_OPT_RULES            = 'rules'
+SW_OPT_SCRIPTONLY       = 'scriptonly'
+SW_OPT_SIMD             = 'simd'
+SW_OPT_THREADS          = 'threads'
+
+# build backends
+
+SW_BUILDER_CMAKE    = 'cmake'
+SW_BUILDER_DIRECT   = 'direct'
+
+# compile profiles, combine with '+', e.g. 'native+lto'
+
+SW_PROFILE_LTO      = 'lto'
+SW_PROFILE_NATIVE   = 'native'
+SW_PROFILE_OPENMP   = 'openmp'
+SW_PROFILE_PORTABLE = 'portable'
+
+# SIMD instruction sets for CPU code, 'auto' picks the best one on the host
+
+SW_SIMD_AUTO        = 'auto'
+SW_SIMD_AVX         = 'avx'
+SW_SIMD_AVX2        = 'avx2'
+SW_SIMD_AVX512      = 'avx512'
+SW_SIMD_SSE2        = 'sse2'
+
+# native library status
+
+SW_STATUS_BUILDING  = 'building'
+SW_STATUS_FAILED    = 'failed'
+SW_STATUS_READY     = 'ready'
 
 # transform direction, 'k'
 
@@ -52,6 +99,7 @@ SW_HIP  = 'HIP'
 SW_METADATA_START   = '!!START_METADATA!!'
 SW_METADATA_END     = '!!END_METADATA!!'
 SW_METAFILE_EXT     = '_meta.c'
+SW_METASECTION      = '.swmeta'
 SW_METAVAR_EXT      = '_metadata'
 
 SW_STR_DOUBLE       = 'Double'
@@ -71,6 +119,7 @@ SW_TRANSFORM_BATDFT     = 'BATDFT'
 SW_TRANSFORM_BATMDDFT   = 'BATMDDFT'
 SW_TRANSFORM_BATPRDFT   = 'BATPRDFT'
 SW_TRANSFORM_DFT        = 'DFT'
+SW_TRANSFORM_HOCKNEY    = 'HOCKNEY'
 SW_TRANSFORM_MDDFT      = 'MDDFT'
 SW_TRANSFORM_MDRCONV    = 'MDRCONV'
 SW_TRANSFORM_MDRFSCONV  = 'MDRFSCONV'
@@ -78,6 +127,7 @@ SW_TRANSFORM_MDPRDFT    = 'MDPRDFT'
 SW_TRANSFORM_UNKNOWN    = 'UNKNOWN'
 
 SW_KEY_BATCHSIZE        = 'BatchSize'
+SW_KEY_COMPILEPROFILE   = 'CompileProfile'
 SW_KEY_DESTROY          = 'Destroy'
 SW_KEY_DIMENSIONS       = 'Dimensions'
 SW_KEY_DIRECTION        = 'Direction'
@@ -85,13 +135,19 @@ SW_KEY_EXEC             = 'Exec'
 SW_KEY_FILENAME         = 'Filename'
 SW_KEY_FUNCTIONS        = 'Functions'
 SW_KEY_INIT             = 'Init'
+SW_KEY_INPLACE          = 'Inplace'
 SW_KEY_METADATA         = 'Metadata'
 SW_KEY_NAMES            = 'Names'
+SW_KEY_NATIVETARGET     = 'NativeTarget'
+SW_KEY_NORMALIZED       = 'Normalized'
 SW_KEY_ORDER            = 'Order'
 SW_KEY_PLATFORM         = 'Platform'
 SW_KEY_PRECISION        = 'Precision'
 SW_KEY_READSTRIDE       = 'ReadStride'
+SW_KEY_REENTRANT        = 'Reentrant'
+SW_KEY_SIMD             = 'SIMD'
 SW_KEY_SPIRALBUILDINFO  = 'SpiralBuildInfo'
+SW_KEY_THREADS          = 'Threads'
 SW_KEY_TRANSFORMS       = 'Transforms'
 SW_KEY_TRANSFORMTYPE    = 'TransformType'
 SW_KEY_TRANSFORMTYPES   = 'TransformTypes'
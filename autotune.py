@@ -0,0 +1,165 @@
+"""
+SnowWhite Autotune Module
+=========================
+
+Empirical selection of SPIRAL rule choices, with the results kept as
+"wisdom" that can be exported to a file and imported on other nodes with
+the same hardware.
+
+A candidate is a named list of SPIRAL statements written into the script
+after the SPIRAL opts are created.  autotune() builds a solver for each
+candidate, times its solve() on this machine, and records the fastest in
+the wisdom.  Solvers created afterwards for the same problem use the
+recorded candidate.  The SW_WISDOM environment variable names a wisdom
+file that is imported when wisdom is first needed.
+"""
+
+from snowwhite import *
+
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+# candidate rule sets, names map to SPIRAL statements
+SW_TUNE_CANDIDATES = {
+    'default'   : [],
+    'ct'        : ['opts.breakdownRules.DFT := [DFT_Base, DFT_CT];'],
+    'ct_gt'     : ['opts.breakdownRules.DFT := [DFT_Base, DFT_CT, DFT_GoodThomas];'],
+    'ct_pd'     : ['opts.breakdownRules.DFT := [DFT_Base, DFT_CT, DFT_PD];'],
+    'ct_rader'  : ['opts.breakdownRules.DFT := [DFT_Base, DFT_CT, DFT_Rader];'],
+}
+
+_wisdom = dict()
+_wisdomLock = threading.Lock()
+_wisdomEnvLoaded = False
+
+
+def hostSignature():
+    """String identifying this machine's hardware for wisdom lookup."""
+    cpu = platform.processor()
+    if sys.platform.startswith('linux'):
+        try:
+            with open('/proc/cpuinfo', 'r') as f:
+                for line in f:
+                    if line.startswith('model name'):
+                        cpu = line.split(':', 1)[1].strip()
+                        break
+        except OSError:
+            pass
+    return platform.system() + '/' + platform.machine() + '/' + cpu
+
+
+def wisdomKey(searchmd):
+    """Wisdom key for solver search metadata on this host."""
+    md = {k:v for k,v in searchmd.items() if v != None}
+    return json.dumps(md, sort_keys=True) + '|' + hostSignature()
+
+
+def _loadEnvWisdom():
+    global _wisdomEnvLoaded
+    if _wisdomEnvLoaded:
+        return
+    _wisdomEnvLoaded = True
+    path = os.getenv(SW_WISDOM)
+    if path != None and os.path.exists(path):
+        importWisdom(path)
+
+
+def lookupWisdom(searchmd):
+    """Return wisdom entry for solver search metadata, or None."""
+    _loadEnvWisdom()
+    with _wisdomLock:
+        return _wisdom.get(wisdomKey(searchmd))
+
+
+def recordWisdom(searchmd, name, rules, times):
+    """Record winning candidate for solver search metadata."""
+    with _wisdomLock:
+        _wisdom[wisdomKey(searchmd)] = {'candidate' : name, 'rules' : list(rules), 'times' : times}
+
+
+def importWisdom(path):
+    """Merge wisdom from JSON file."""
+    with open(path, 'r') as f:
+        entries = json.load(f)
+    with _wisdomLock:
+        _wisdom.update(entries)
+
+
+def exportWisdom(path):
+    """Write all wisdom to JSON file."""
+    with _wisdomLock:
+        entries = dict(_wisdom)
+    tmppath = path + '.' + str(os.getpid())
+    with open(tmppath, 'w') as f:
+        json.dump(entries, f, indent=1, sort_keys=True)
+    os.replace(tmppath, path)
+
+
+def forgetWisdom():
+    """Discard all wisdom in this process."""
+    with _wisdomLock:
+        _wisdom.clear()
+
+
+def _timeSolve(solver, args, reps):
+    """Best time of reps calls to solver.solve(*args), after one warmup call."""
+    solver.solve(*args)
+    best = None
+    for i in range(reps):
+        t0 = time.perf_counter()
+        solver.solve(*args)
+        t = time.perf_counter() - t0
+        best = t if best == None else min(best, t)
+    return best
+
+
+def autotune(problem, opts = {}, candidates = None, args = None, reps = 10):
+    """Time candidate rule sets for problem and record the fastest as wisdom.
+
+    Arguments:
+    problem     -- problem to tune
+    opts        -- solver options
+    candidates  -- dict of candidate name to SPIRAL statements, default SW_TUNE_CANDIDATES
+    args        -- arguments to solve(), default from the solver's buildTestInput()
+    reps        -- number of timed calls per candidate
+
+    Returns (winning candidate name, dict of candidate name to best time).
+    """
+    from snowwhite.prebuild import solverClassFor
+    if candidates == None:
+        candidates = SW_TUNE_CANDIDATES
+    cls = solverClassFor(problem)
+
+    times = dict()
+    searchmd = None
+    for (name, rules) in candidates.items():
+        o = dict(opts)
+        # candidates are built now and timed on the generated code, never on runDef()
+        o.pop(SW_OPT_ASYNCBUILD, None)
+        o.pop(SW_OPT_SCRIPTONLY, None)
+        o[SW_OPT_AUTOTUNE] = False
+        o[SW_OPT_RULES] = rules
+        try:
+            solver = cls(problem, o)
+        except RuntimeError as ex:
+            print('Autotune candidate ' + name + ' failed: ' + str(ex), file=sys.stderr)
+            continue
+        if not solver.waitReady():
+            print('Autotune candidate ' + name + ' failed: library is not loaded', file=sys.stderr)
+            continue
+        # requested options, the build may have dropped threads or SIMD
+        searchmd = solver._wisdomSearch
+        if args == None:
+            testIn = solver.buildTestInput()
+            args = testIn if type(testIn) is tuple else (testIn,)
+        times[name] = _timeSolve(solver, args, reps)
+
+    if len(times) == 0:
+        raise RuntimeError('no autotune candidate could be built')
+    best = min(times, key=times.get)
+    recordWisdom(searchmd, best, candidates[best], times)
+    return (best, times)
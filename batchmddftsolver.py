@@ -87,25 +87,40 @@ class BatchMddftSolver(SWSolver):
         pass
     
     def solve(self, src, dst=None):
-        """Call SPIRAL-generated function."""
-    
+        """Call SPIRAL-generated function, in-place if the inplace option is set."""
+        
+        dst = self._inplaceDst(src, dst)
+        if not self.ready():
+            return self._solveDef(dst, src)
         if type(dst) == type(None):
-            xp = get_array_module(src)
-            dims = self._problem.dimensions()
-            b = self._problem.szBatch()
-            dimsTuple = tuple([b]) + tuple(dims)
-            dst = xp.zeros(dimsTuple, src.dtype)
+            dst = self._newDst(src)
         
         self._func(dst, src)
-        if self._problem.direction() == SW_INVERSE:
+        self._postProcess(dst)
+        return dst
+        
+    def _newDst(self, src):
+        xp = get_array_module(src)
+        dims = self._problem.dimensions()
+        b = self._problem.szBatch()
+        dimsTuple = tuple([b]) + tuple(dims)
+        return self._newArray(xp, dimsTuple, src.dtype)
+        
+    def _normalized(self):
+        return self._fuseScale and self._problem.direction() == SW_INVERSE
+        
+    def _supportsInplace(self):
+        return True
+        
+    def _postProcess(self, dst):
+        if self._problem.direction() == SW_INVERSE and not self._normalized():
             xp = get_array_module(dst)
             scale = xp.size(dst) / self._problem.szBatch()
             xp.divide(dst, scale, out=dst)
-        return dst
 
     def _writeScript(self, script_file):
         nameroot = self._namebase
-        filename = nameroot
+        filename = self._outputBase()
         filetype = '.c'
         if self._genCuda:
             filetype = '.cu'
@@ -121,7 +136,10 @@ class BatchMddftSolver(SWSolver):
         print('    ns := ' + str(self._problem.dimensions()) + ',', file = script_file)
         print('    k := ' + str(self._problem.direction()) + ',', file = script_file)
         print('    name := "' + nameroot + '",', file = script_file)
-        print('    TFCall(TRC(TTensorI(MDDFT(ns, k), batch, apat, apat)),', file = script_file)
+        mddft = 'MDDFT(ns, k)'
+        if self._normalized():
+            mddft = 'Scale(1/' + str(np.prod(self._problem.dimensions())) + ', ' + mddft + ')'
+        print('    TFCall(' + self._inplaceSpec('TRC(TTensorI(' + mddft + ', batch, apat, apat))') + ',', file = script_file)
         print('        rec(fname := name, params := []))', file = script_file)
         print(');', file = script_file)
         print('', file = script_file)
@@ -138,6 +156,7 @@ class BatchMddftSolver(SWSolver):
             print('opts.wrapCFuncs := true;', file = script_file)
         if self._opts.get(SW_OPT_REALCTYPE) == "float":
             print('opts.TRealCtype := "float";', file = script_file)
+        self._writeCodegenOpts(script_file)
         self._writePrintOpts(script_file)
         print('', file = script_file)  
 
@@ -0,0 +1,118 @@
+"""
+SnowWhite Buffer Pool Module
+============================
+
+Reusable, aligned NumPy buffers for solver outputs and workspaces.
+
+A solver given a pool, with the bufferpool option or inside a
+useBufferPool() block, takes its outputs from the pool instead of
+allocating and zero-filling a new array on each call; the generated
+kernels overwrite the whole output.  A buffer goes back into use once
+no array refers to its memory, so a loop like
+    for x in inputs:
+        y = solver.solve(x)
+cycles through two buffers.  CuPy arrays are not pooled, CuPy has its
+own memory pool.
+"""
+
+import contextlib
+import sys
+import threading
+
+import numpy as np
+
+_context = threading.local()
+
+
+def _refs(entry):
+    return sys.getrefcount(entry[0])
+
+
+# references to a free buffer, from the pool's entry and the call
+_FREE_REFS = _refs((np.empty(1, np.uint8), 0))
+
+
+class BufferPool:
+    """Pool of aligned buffers, reused by size in bytes."""
+
+    def __init__(self, alignment=64):
+        self._alignment = alignment
+        self._buffers = dict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._highWater = 0
+        self._hits = 0
+        self._misses = 0
+
+    def empty(self, shape, dtype, order='C'):
+        """Return array from the pool, contents undefined."""
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        with self._lock:
+            entries = self._buffers.setdefault(nbytes, [])
+            entry = None
+            for e in entries:
+                # only the pool refers to a free buffer
+                if _refs(e) <= _FREE_REFS:
+                    entry = e
+                    self._hits += 1
+                    break
+            if entry == None:
+                raw = np.empty(nbytes + self._alignment, np.uint8)
+                offset = (-raw.ctypes.data) % self._alignment
+                entry = (raw, offset)
+                entries.append(entry)
+                self._misses += 1
+                self._bytes += raw.nbytes
+                self._highWater = max(self._highWater, self._bytes)
+            (raw, offset) = entry
+        return np.ndarray(shape, dtype, buffer=raw, offset=offset, order=order)
+
+    def zeros(self, shape, dtype, order='C'):
+        """Return zero-filled array from the pool."""
+        a = self.empty(shape, dtype, order)
+        a.fill(0)
+        return a
+
+    def clear(self):
+        """Drop buffers not in use."""
+        with self._lock:
+            for (nbytes, entries) in self._buffers.items():
+                keep = [e for e in entries if _refs(e) > _FREE_REFS]
+                self._bytes -= sum([e[0].nbytes for e in entries if _refs(e) <= _FREE_REFS])
+                self._buffers[nbytes] = keep
+
+    def stats(self):
+        """Dict of pool bytes, bytes in use, high-water bytes, buffer count, hits and misses."""
+        with self._lock:
+            inUse = 0
+            count = 0
+            for entries in self._buffers.values():
+                for e in entries:
+                    count += 1
+                    if _refs(e) > _FREE_REFS:
+                        inUse += e[0].nbytes
+            return {'bytes' : self._bytes, 'in_use' : inUse, 'high_water' : self._highWater,
+                    'buffers' : count, 'hits' : self._hits, 'misses' : self._misses}
+
+
+@contextlib.contextmanager
+def useBufferPool(pool):
+    """Solvers without their own pool use pool in this thread inside the block."""
+    stack = getattr(_context, 'stack', None)
+    if stack == None:
+        stack = []
+        _context.stack = stack
+    stack.append(pool)
+    try:
+        yield pool
+    finally:
+        stack.pop()
+
+
+def currentBufferPool():
+    """Pool of the innermost useBufferPool() block in this thread, or None."""
+    stack = getattr(_context, 'stack', None)
+    if not stack:
+        return None
+    return stack[-1]
@@ -0,0 +1,149 @@
+"""
+SnowWhite Request Coalescing Module
+===================================
+
+Micro-batching of small independent transforms for asyncio services.
+Concurrent calls to
+    y = await solver.submit(x)
+are collected for up to maxWait seconds, or until maxBatch are waiting,
+then stacked and run as one call to a batched library: DftProblem with
+batchDims [b,1] for a 1D DftSolver, BatchMddftProblem for an MddftSolver.
+Batches are padded with zeros to a power of two, so at most
+log2(maxBatch)+1 batched libraries are built, each the first time a
+batch of its size runs unless prepare() builds them up front.  Each
+result is a view of its row of the batch output.
+"""
+
+from snowwhite import *
+from snowwhite.dftsolver import *
+from snowwhite.mddftsolver import *
+from snowwhite.batchmddftsolver import *
+
+import asyncio
+import threading
+
+import numpy as np
+
+SW_MAXBATCH = 64
+SW_MAXWAIT  = 0.001
+
+
+class SWCoalescer:
+    """Collects submitted inputs for a solver and runs them in batches."""
+
+    def __init__(self, solver, maxBatch=SW_MAXBATCH, maxWait=SW_MAXWAIT):
+        """Arguments:
+        solver   -- unbatched DftSolver or C-ordered MddftSolver
+        maxBatch -- largest number of inputs in one native call
+        maxWait  -- seconds the first input of a batch waits for more
+        """
+        if isinstance(solver, DftSolver):
+            if np.prod(solver._problem._batchDims) != 1:
+                raise ValueError('submit() needs an unbatched DftSolver')
+            self._shape = (solver._problem.dimN(),)
+        elif isinstance(solver, MddftSolver):
+            if solver._colMajor:
+                raise ValueError('submit() needs a C-ordered MddftSolver')
+            self._shape = tuple(solver._problem.dimensions())
+        else:
+            raise TypeError('submit() supports DftSolver and MddftSolver')
+        if solver._inplace:
+            raise ValueError('submit() returns new arrays, create the solver without the inplace option')
+        if maxBatch < 1 or maxWait < 0:
+            raise ValueError('maxBatch must be at least 1 and maxWait not negative')
+        self._solver = solver
+        self._maxBatch = int(maxBatch)
+        self._maxWait = maxWait
+        self._pending = []
+        self._timer = None
+        self._batchSolvers = dict()
+        self._batchLock = threading.Lock()
+
+    def maxBatch(self):
+        return self._maxBatch
+
+    def maxWait(self):
+        return self._maxWait
+
+    def batchSizes(self):
+        """Sizes of the batched solvers a batch may run on."""
+        sizes = []
+        b = 2
+        while b < self._maxBatch:
+            sizes.append(b)
+            b = b * 2
+        if self._maxBatch > 1:
+            sizes.append(self._maxBatch)
+        return sizes
+
+    def prepare(self):
+        """Create the batched solvers for every batch size now, building any missing libraries."""
+        for b in self.batchSizes():
+            self._batchSolver(b)
+
+    async def submit(self, src):
+        """Solve src in the next batch, return its result."""
+        if tuple(src.shape) != self._shape:
+            raise ValueError('submit() input must have shape ' + str(self._shape))
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((src, fut))
+        if len(self._pending) >= self._maxBatch:
+            self._flush(loop)
+        elif self._timer == None:
+            self._timer = loop.call_later(self._maxWait, self._flush, loop)
+        return await fut
+
+    def _flush(self, loop):
+        """Start the pending inputs on the executor, maxBatch at a time."""
+        if self._timer != None:
+            self._timer.cancel()
+            self._timer = None
+        pending = [p for p in self._pending if not p[1].cancelled()]
+        self._pending = []
+        while len(pending) > 0:
+            batch = pending[:self._maxBatch]
+            pending = pending[self._maxBatch:]
+            task = loop.run_in_executor(None, self._solveBatch, [src for (src, fut) in batch])
+            task.add_done_callback(lambda task, batch=batch: self._scatter(batch, task))
+
+    def _scatter(self, batch, task):
+        """Hand each submitter its result or the batch's exception."""
+        exc = task.exception()
+        results = None if exc != None else task.result()
+        for i, (src, fut) in enumerate(batch):
+            if fut.done():
+                continue
+            if exc != None:
+                fut.set_exception(exc)
+            else:
+                fut.set_result(results[i])
+
+    def _solveBatch(self, srcs):
+        """Run inputs as one batch, return the list of outputs."""
+        if len(srcs) == 1:
+            return [self._solver.solve(srcs[0])]
+        b = min(1 << (len(srcs) - 1).bit_length(), self._maxBatch)
+        solver = self._batchSolver(b)
+        xp = get_array_module(srcs[0])
+        batch = solver._newArray(xp, (b,) + self._shape, srcs[0].dtype, zero=False)
+        for i, src in enumerate(srcs):
+            batch[i] = src
+        batch[len(srcs):] = 0
+        out = solver.solve(batch)
+        return [out[i] for i in range(len(srcs))]
+
+    def _batchSolver(self, b):
+        """Solver for batches of b inputs, created on first use."""
+        with self._batchLock:
+            solver = self._batchSolvers.get(b)
+            if solver == None:
+                opts = dict(self._solver._opts)
+                opts.pop(SW_OPT_INPLACE, None)
+                k = self._solver._problem.direction()
+                if isinstance(self._solver, DftSolver):
+                    solver = DftSolver(DftProblem(self._shape[0], k, [b, 1]), opts)
+                else:
+                    solver = BatchMddftSolver(BatchMddftProblem(list(self._shape), b, k), opts)
+                self._batchSolvers[b] = solver
+            return solver
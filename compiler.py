@@ -0,0 +1,305 @@
+"""
+SnowWhite Compiler Module
+=========================
+
+Direct compile backend.  The C toolchain is probed once, the result is
+cached in memory and in the libraries directory, and generated sources
+are then compiled and linked with a single compiler call, skipping the
+per-transform CMake configure.
+"""
+
+from snowwhite import *
+
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+SW_TOOLCHAIN_FILE = '.toolchain.json'
+
+_COMPILER_CANDIDATES = ['cc', 'gcc', 'clang']
+_RELEASE_FLAGS = ['-O3', '-DNDEBUG']
+_SHARED_FLAGS = ['-fPIC', '-shared']
+_LINK_LIBS = ['-lm']
+
+# flags added for each compile profile, used for both compiling and linking
+SW_PROFILE_FLAGS = {
+    SW_PROFILE_LTO      : ['-flto'],
+    SW_PROFILE_NATIVE   : ['-march=native'],
+    SW_PROFILE_OPENMP   : ['-fopenmp'],
+    SW_PROFILE_PORTABLE : [],
+}
+
+# flags for each SIMD instruction set
+SW_SIMD_FLAGS = {
+    SW_SIMD_SSE2    : ['-msse2'],
+    SW_SIMD_AVX     : ['-mavx'],
+    SW_SIMD_AVX2    : ['-mavx2', '-mfma'],
+    SW_SIMD_AVX512  : ['-mavx512f'],
+}
+
+# SIMD instruction sets, best first, with the CPU flags each needs
+_SIMD_CPU_FLAGS = [
+    (SW_SIMD_AVX512,    ['avx512f']),
+    (SW_SIMD_AVX2,      ['avx2', 'fma']),
+    (SW_SIMD_AVX,       ['avx']),
+    (SW_SIMD_SSE2,      ['sse2']),
+]
+
+# functions generated OpenMP code calls to start a parallel region, GCC and LLVM
+_OPENMP_ENTRY_POINTS = ['GOMP_parallel', 'GOMP_parallel_start', '__kmpc_fork_call']
+
+# nm classes of writable variables: bss, data, and common
+_WRITABLE_SYMBOL_TYPES = ['b', 'B', 'd', 'D', 'C']
+# writable variables the C runtime adds to every shared library
+_RUNTIME_SYMBOLS = ['completed']
+
+_hostSIMD = None
+_nativeTargets = dict()
+
+_toolchainCache = dict()
+_toolchainLock = threading.Lock()
+
+
+def _findCompiler():
+    cc = os.getenv('CC')
+    if cc != None:
+        return shutil.which(cc)
+    for name in _COMPILER_CANDIDATES:
+        path = shutil.which(name)
+        if path != None:
+            return path
+    return None
+
+
+def _includeDirs():
+    sh = os.getenv('SPIRAL_HOME')
+    if sh == None:
+        return []
+    return [os.path.join(sh, 'profiler', 'targets'),
+            os.path.join(sh, 'profiler', 'targets', 'include')]
+
+
+def _probe(cc):
+    """Check that cc can build a shared library with the release flags."""
+    tempdir = tempfile.mkdtemp(prefix='sw_probe_')
+    try:
+        src = os.path.join(tempdir, 'probe.c')
+        with open(src, 'w') as f:
+            print('int sw_probe(void) { return 0; }', file = f)
+        out = os.path.join(tempdir, 'libprobe' + SW_SHLIB_EXT)
+        cmd = [cc] + _RELEASE_FLAGS + _SHARED_FLAGS + ['-o', out, src] + _LINK_LIBS
+        res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return res.returncode == 0
+    except OSError:
+        return False
+    finally:
+        shutil.rmtree(tempdir, ignore_errors=True)
+
+
+def probeToolchain(cachedir):
+    """Return toolchain dict for direct builds, or None if unusable.
+
+    The result is cached per compiler, keyed by the compiler's path and
+    modification time, in memory and in a file in cachedir.
+    """
+    if sys.platform == 'win32':
+        return None
+    cc = _findCompiler()
+    if cc == None:
+        return None
+    stamp = os.stat(cc).st_mtime
+    with _toolchainLock:
+        tc = _toolchainCache.get(cc)
+        if tc != None and tc.get('mtime') == stamp:
+            return tc if tc.get('ok') else None
+
+        cachefile = os.path.join(cachedir, SW_TOOLCHAIN_FILE)
+        try:
+            with open(cachefile, 'r') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = dict()
+        tc = saved.get(cc)
+        if tc == None or tc.get('mtime') != stamp:
+            tc = {'cc' : cc, 'mtime' : stamp, 'ok' : _probe(cc),
+                  'cflags' : _RELEASE_FLAGS + _SHARED_FLAGS, 'libs' : _LINK_LIBS}
+            saved[cc] = tc
+            try:
+                tmpfile = cachefile + '.' + str(os.getpid())
+                with open(tmpfile, 'w') as f:
+                    json.dump(saved, f, indent=1)
+                os.replace(tmpfile, cachefile)
+            except OSError:
+                pass
+        _toolchainCache[cc] = tc
+        return tc if tc.get('ok') else None
+
+
+def normalizeProfile(profile):
+    """Canonical name of compile profile given as string or list of names."""
+    if profile == None:
+        return SW_PROFILE_PORTABLE
+    if isinstance(profile, str):
+        profile = profile.split('+')
+    names = sorted(set([p.strip().lower() for p in profile]) - set(['', SW_PROFILE_PORTABLE]))
+    for name in names:
+        if name not in SW_PROFILE_FLAGS:
+            raise ValueError('unknown compile profile: ' + name)
+    if len(names) == 0:
+        return SW_PROFILE_PORTABLE
+    return '+'.join(names)
+
+
+def profileFlags(profile):
+    """Compiler and linker flags for a normalized compile profile."""
+    flags = []
+    for name in profile.split('+'):
+        flags += SW_PROFILE_FLAGS[name]
+    return flags
+
+
+def simdFlags(simd):
+    """Compiler flags for SIMD instruction set, or none if simd is None."""
+    if simd == None:
+        return []
+    return SW_SIMD_FLAGS[simd]
+
+
+def _cpuFlags():
+    """CPU feature flags of this host, empty if unknown."""
+    if sys.platform.startswith('linux'):
+        try:
+            with open('/proc/cpuinfo', 'r') as f:
+                for line in f:
+                    if line.startswith('flags'):
+                        return set(line.split(':', 1)[1].split())
+        except OSError:
+            pass
+    return set()
+
+
+def hostSIMD():
+    """SIMD instruction sets supported by this host, best first."""
+    global _hostSIMD
+    if _hostSIMD != None:
+        return _hostSIMD
+    cpuflags = _cpuFlags()
+    if len(cpuflags) == 0 and platform.machine().lower() in ['x86_64', 'amd64']:
+        # SSE2 is part of the x86_64 baseline
+        cpuflags = set(['sse2'])
+    _hostSIMD = [isa for (isa, need) in _SIMD_CPU_FLAGS if cpuflags.issuperset(need)]
+    return _hostSIMD
+
+
+def _digest(names):
+    return hashlib.sha256(' '.join(sorted(names)).encode('utf-8')).hexdigest()[:12]
+
+
+def _queryNativeTarget(cc):
+    """CPU -march=native selects, with a digest of the target options it enables."""
+    if cc != None:
+        try:
+            res = subprocess.run([cc, '-march=native', '-Q', '--help=target'],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        except OSError:
+            res = None
+        if res != None and res.returncode == 0:
+            march = None
+            enabled = []
+            for line in res.stdout.splitlines():
+                fields = line.split()
+                if len(fields) == 2 and fields[0] == '-march=':
+                    march = fields[1]
+                elif len(fields) == 2 and fields[1] == '[enabled]':
+                    enabled.append(fields[0])
+            if march != None:
+                return march + '-' + _digest(enabled)
+    # compiler can't report the target, identify the host by its CPU flags
+    return platform.machine() + '-' + _digest(_cpuFlags() or hostSIMD())
+
+
+def nativeTarget():
+    """Target the native compile profile builds for on this host.
+    
+    Libraries built with -march=native may use instructions other hosts
+    lack, so the target is part of their cache key and metadata.
+    """
+    cc = _findCompiler()
+    with _toolchainLock:
+        target = _nativeTargets.get(cc)
+    if target == None:
+        target = _queryNativeTarget(cc)
+        with _toolchainLock:
+            _nativeTargets[cc] = target
+    return target
+
+
+def compileLibrary(toolchain, sources, libpath, flags=[]):
+    """Compile and link sources into shared library libpath, return exit code."""
+    os.makedirs(os.path.dirname(libpath), exist_ok=True)
+    incs = ['-I' + d for d in [os.path.dirname(sources[0])] + _includeDirs()]
+    cmd = [toolchain['cc']] + toolchain['cflags'] + flags + incs + ['-o', libpath] + sources + toolchain['libs']
+    res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if res.returncode != 0:
+        print(res.stderr.decode(), file=sys.stderr)
+    return res.returncode
+
+
+def librarySymbols(path, undefined=False):
+    """Symbols of a shared library as (nm class, name, ELF type) triples, None if nm is not available.
+    
+    Defined symbols come from the full symbol table, so static variables
+    are included; undefined ones are the library's dynamic imports.  The
+    ELF type tells thread-local variables (TLS) from others (OBJECT).
+    """
+    if undefined:
+        cmd = ['nm', '-f', 'sysv', '-D', '--undefined-only', path]
+    else:
+        cmd = ['nm', '-f', 'sysv', '--defined-only', path]
+    try:
+        res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    except OSError:
+        return None
+    if res.returncode != 0:
+        return None
+    symbols = []
+    for line in res.stdout.splitlines():
+        fields = [f.strip() for f in line.split('|')]
+        if len(fields) >= 4:
+            symbols.append((fields[2], fields[0], fields[3]))
+    return symbols
+
+
+def libraryUsesOpenMP(path):
+    """True if the library starts OpenMP parallel regions, None if that can't be checked."""
+    symbols = librarySymbols(path, undefined=True)
+    if symbols == None:
+        return None
+    return any(name.split('@')[0] in _OPENMP_ENTRY_POINTS for (c, name, t) in symbols)
+
+
+def writableSymbols(path):
+    """Names of writable variables a library defines, None if nm is not available.
+    
+    Variables of the C runtime and the metadata pointer are left out, so
+    what remains is the global state of the generated code.  Thread-local
+    variables are left out too, each thread has its own.
+    """
+    symbols = librarySymbols(path)
+    if symbols == None:
+        return None
+    names = []
+    for (c, name, t) in symbols:
+        base = name.split('.')[0]
+        if c not in _WRITABLE_SYMBOL_TYPES or t == 'TLS' or base.startswith('_') or base in _RUNTIME_SYMBOLS:
+            continue
+        if name.endswith(SW_METAVAR_EXT):
+            continue
+        names.append(name)
+    return names
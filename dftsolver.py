@@ -85,22 +85,48 @@ class DftSolver(SWSolver):
         
     def _trace(self):
         pass
+        
+    def buildTestInput(self):
+        """Random input for this problem."""
+        n = self._problem.dimN()
+        bdims = list(self._problem._batchDims)
+        if np.prod(bdims) == 1:
+            dims = [n]
+        elif self._problem._readStride == 1:
+            dims = bdims + [n]
+        else:
+            dims = [n] + bdims
+        cxtype = np.csingle if self._opts.get(SW_OPT_REALCTYPE) == "float" else np.cdouble
+        src = (np.random.random(dims) + np.random.random(dims) * 1j).astype(cxtype)
+        if self._genCuda or self._genHIP:
+            src = cp.asarray(src)
+        return src
 
     def solve(self, src, dst=None):
-        """Call SPIRAL-generated function."""
+        """Call SPIRAL-generated function, in-place if the inplace option is set."""
+        dst = self._inplaceDst(src, dst)
+        if not self.ready():
+            return self._solveDef(dst, src)
         if type(dst) == type(None):
-            xp = get_array_module(src)
-            if self._problem._writeStride == self._problem._readStride:
-                dst = xp.zeros_like(src)
-            else:
-                # reverse dims
-                dims = src.shape[::-1]
-                dst = xp.zeros(dims,src.dtype)
+            dst = self._newDst(src)
         self._func(dst, src)
         return dst
+        
+    def _supportsInplace(self):
+        # strided reads and writes transpose the data, which needs a second buffer
+        return self._problem._readStride == self._problem._writeStride
+        
+    def _newDst(self, src):
+        xp = get_array_module(src)
+        if self._problem._writeStride == self._problem._readStride:
+            ordc = 'F' if src.flags.f_contiguous and not src.flags.c_contiguous else 'C'
+            return self._newArray(xp, src.shape, src.dtype, ordc)
+        # reverse dims
+        dims = src.shape[::-1]
+        return self._newArray(xp, dims, src.dtype)
 
     def _writeScript(self, script_file):
-        filename = self._namebase
+        filename = self._outputBase()
         nameroot = self._namebase
         filetype = '.c'
         if self._genCuda:
@@ -127,7 +153,8 @@ class DftSolver(SWSolver):
         print('t := let(', file = script_file) 
         print('    name := "' + nameroot + '",', file = script_file)
         print('    N  := ' + str(self._problem.dimN()) + ',', file = script_file)
-        print('    TFCall(TRC(TTensorI(' + dft_def + ', ' + bdims_str + ' ,' + W + ', ' + R +')), rec(fname := name, params := []))', file = script_file)
+        spec = self._inplaceSpec('TRC(TTensorI(' + dft_def + ', ' + bdims_str + ' ,' + W + ', ' + R +'))')
+        print('    TFCall(' + spec + ', rec(fname := name, params := []))', file = script_file)
         print(');', file = script_file)
         
         if self._genCuda:
@@ -144,6 +171,7 @@ class DftSolver(SWSolver):
         if self._opts.get(SW_OPT_REALCTYPE) == "float":
             print('opts.TRealCtype := "float";', file = script_file)
 
+        self._writeCodegenOpts(script_file)
         self._writePrintOpts(script_file)
 
         print('Add(opts.includes, "<float.h>");',  file = script_file)
@@ -0,0 +1,51 @@
+#! python
+
+"""
+usage: run-reentrant.py sz [ workers ]
+  sz is N or N1,N2,.. all N >= 2, single N implies 3D cube
+  workers is the number of threads solving at once   (default: 4)
+
+Build an MDDFT on the CPU with the reentrant option, report whether the
+built library was found free of global state (calls to it are
+serialized if not), then solve a batch of inputs on a thread pool with
+solve_many(), compare each result with the Python definition, and time
+the batch against solving the inputs one at a time.
+"""
+
+from snowwhite.mddftsolver import *
+import numpy as np
+import time
+import sys
+
+def usage():
+    print(__doc__.strip())
+    sys.exit()
+
+try:
+    nnn = [int(n) for n in sys.argv[1].split(',')]
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+except:
+    usage()
+dims = nnn * 3 if len(nnn) == 1 else nnn
+if any(n < 2 for n in dims) or workers < 1:
+    usage()
+
+opts = { SW_OPT_PLATFORM : SW_CPU, SW_OPT_REENTRANT : True }
+solver = MddftSolver(MddftProblem(dims), opts)
+print('Reentrant requested, library ' + ('is reentrant' if solver.reentrant() else 'keeps global state, calls are serialized'))
+
+srcs = [np.random.random(dims) + np.random.random(dims) * 1j for i in range(4 * workers)]
+
+t0 = time.perf_counter()
+outs = solver.solve_many(srcs, workers=1)
+serial = time.perf_counter() - t0
+t0 = time.perf_counter()
+outs = solver.solve_many(srcs, workers=workers)
+parallel = time.perf_counter() - t0
+
+diff = max([np.max(np.absolute(out - solver.runDef(src))) for (src, out) in zip(srcs, outs)])
+print(str(len(srcs)) + ' solves: ' + '{:.6f}'.format(serial) + ' s on 1 thread, ' +
+      '{:.6f}'.format(parallel) + ' s on ' + str(workers))
+print('Max diff between Python/C transforms = ' + str(diff))
+
+sys.exit(0 if diff < 1e-8 * np.prod(dims) else 1)
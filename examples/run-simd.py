@@ -0,0 +1,48 @@
+#! python
+
+"""
+usage: run-simd.py sz [ simd ]
+  sz is N or N1,N2,.. all N >= 2, single N implies 3D cube
+  simd is sse2, avx, avx2, avx512 or auto   (default: auto)
+
+Build a vectorized MDDFT on the CPU, report the instruction set the
+library was actually built for (None if SPIRAL generated scalar code),
+then compare with the Python definition and time the transform.
+"""
+
+from snowwhite.mddftsolver import *
+from snowwhite.metadata import metadataInFile
+import numpy as np
+import time
+import sys
+
+def usage():
+    print(__doc__.strip())
+    sys.exit()
+
+try:
+    nnn = [int(n) for n in sys.argv[1].split(',')]
+except:
+    usage()
+dims = nnn * 3 if len(nnn) == 1 else nnn
+if any(n < 2 for n in dims):
+    usage()
+simd = sys.argv[2] if len(sys.argv) > 2 else SW_SIMD_AUTO
+
+opts = { SW_OPT_PLATFORM : SW_CPU, SW_OPT_SIMD : simd, SW_OPT_METADATA : True }
+solver = MddftSolver(MddftProblem(dims), opts)
+stats = solver.build_stats()
+funcs = metadataInFile(stats['library'])[SW_KEY_TRANSFORMS]
+built = [f.get(SW_KEY_SIMD) for f in funcs if f[SW_KEY_NAMES][SW_KEY_EXEC] == solver._mainFuncName]
+print('Requested ' + simd + ', library from ' + str(stats['source']) + ' built for ' + str(built[0]))
+
+src = np.random.random(dims) + np.random.random(dims) * 1j
+plan = solver.bind(src)
+t0 = time.perf_counter()
+for i in range(10):
+    dst = plan.execute()
+secs = (time.perf_counter() - t0) / 10
+diff = np.max(np.absolute(dst - solver.runDef(src)))
+print('{:.6f}'.format(secs) + ' s, diff between Python/C transforms = ' + str(diff))
+
+sys.exit(0 if diff < 1e-8 * np.size(src) else 1)
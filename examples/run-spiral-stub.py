@@ -0,0 +1,62 @@
+#! python
+
+"""
+usage: run-spiral-stub.py
+
+Drive a SPIRAL session pool with the stub transport, no SPIRAL needed:
+scripts that succeed, a script that fails, a session that crashes, and
+a script that hangs past the timeout.  The pool replaces dead sessions,
+so every script after a failure runs on a working session, including
+one that was waiting for the session that timed out.
+"""
+
+from snowwhite.spiral import *
+import threading
+import time
+import sys
+
+if len(sys.argv) > 1:
+    print(__doc__.strip())
+    sys.exit()
+
+pool = SpiralSessionPool(1, lambda: SpiralStubTransport(timeout=2))
+
+tests = [
+    ('ok',      'Print("hello\\n");',        SPIRAL_RET_OK),
+    ('error',   'Error("bad transform");',   SPIRAL_RET_ERR),
+    ('after',   'Print("still alive\\n");',  SPIRAL_RET_OK),
+    ('crash',   'QUIT_GAP(1);',              SPIRAL_RET_ERR),
+    ('restart', 'Print("new session\\n");',  SPIRAL_RET_OK),
+    ('timeout', 'Sleep(10);',                SPIRAL_RET_ERR),
+    ('restart', 'Print("new session\\n");',  SPIRAL_RET_OK),
+]
+
+failed = 0
+for (name, script, expected) in tests:
+    (ret, output) = pool.runScript(script)
+    status = 'OK    ' if ret == expected else 'FAILED'
+    if ret != expected:
+        failed += 1
+    print(status + ' ' + name + ': ' + repr(output))
+
+# a script waiting for the only session gets a new one when it times out
+results = dict()
+def runTimed(name, script):
+    results[name] = (pool.runScript(script)[0], time.perf_counter())
+hang = threading.Thread(target=runTimed, args=('hang', 'Sleep(10);'), daemon=True)
+hang.start()
+time.sleep(0.5)
+waiter = threading.Thread(target=runTimed, args=('waiter', 'Print("waited\\n");'), daemon=True)
+waiter.start()
+hang.join()
+waiter.join(5)
+ok = (not waiter.is_alive() and results.get('hang', [None])[0] == SPIRAL_RET_ERR
+      and results['waiter'][0] == SPIRAL_RET_OK)
+if not ok:
+    failed += 1
+print(('OK    ' if ok else 'FAILED') + ' waiter: ' + ('ran after timeout' if ok else 'still blocked'))
+tests.append(('waiter', None, SPIRAL_RET_OK))
+
+pool.close()
+print(str(len(tests) - failed) + ' of ' + str(len(tests)) + ' as expected')
+sys.exit(1 if failed > 0 else 0)
@@ -0,0 +1,49 @@
+#! python
+
+"""
+usage: run-threads.py sz threads
+  sz is N or N1,N2,.. all N >= 2, single N implies 3D cube
+  threads is the number of OpenMP threads to generate code for
+
+Build an OpenMP-parallel MDDFT on the CPU, report the thread count the
+library was actually built with (1 if SPIRAL generated serial code),
+then compare with the Python definition and time the transform at each
+thread count from 1 to threads().
+"""
+
+from snowwhite.mddftsolver import *
+import numpy as np
+import time
+import sys
+
+def usage():
+    print(__doc__.strip())
+    sys.exit()
+
+try:
+    nnn = [int(n) for n in sys.argv[1].split(',')]
+    threads = int(sys.argv[2])
+except:
+    usage()
+dims = nnn * 3 if len(nnn) == 1 else nnn
+if any(n < 2 for n in dims) or threads < 1:
+    usage()
+
+opts = { SW_OPT_PLATFORM : SW_CPU, SW_OPT_THREADS : threads, SW_OPT_METADATA : True }
+solver = MddftSolver(MddftProblem(dims), opts)
+print('Requested ' + str(threads) + ' threads, library built for ' + str(solver.threads()))
+
+src = np.random.random(dims) + np.random.random(dims) * 1j
+plan = solver.bind(src)
+failed = False
+for n in range(1, solver.threads() + 1):
+    solver.setThreads(n)
+    t0 = time.perf_counter()
+    for i in range(10):
+        dst = plan.execute()
+    secs = (time.perf_counter() - t0) / 10
+    diff = np.max(np.absolute(dst - solver.runDef(src)))
+    failed = failed or not diff < 1e-8 * np.size(src)
+    print(str(n) + ' threads: ' + '{:.6f}'.format(secs) + ' s, diff between Python/C transforms = ' + str(diff))
+
+sys.exit(1 if failed else 0)
@@ -89,14 +89,27 @@ class HockneySolver(SWSolver):
     def solve(self, src, dst=None):
         """Call SPIRAL-generated code"""
         
+        if not self.ready():
+            # library output is not normalized, see scale()
+            return self._solveDef(dst, src, scale=self._problem.dimN()**3)
+        
         if type(dst) == type(None):
-            Nd = self._problem.dimND()
-            dst = np.zeros((Nd,Nd,Nd), dtype=np.double)
+            dst = self._newDst(src)
 
-        # swapaxes was necessary b/c C interprets symbol in y-->x-->z order
-        self._func(dst, src, np.swapaxes(self._symbol, axis1=0, axis2=1))
+        self._func(*self._nativeArgs(dst, src))
         
         return dst
+        
+    def _newDst(self, src):
+        Nd = self._problem.dimND()
+        return self._newArray(np, (Nd,Nd,Nd), np.double)
+
+    def _traceFromProblem(self):
+        return True
+
+    def _nativeArgs(self, dst, src):
+        # swapaxes was necessary b/c C interprets symbol in y-->x-->z order
+        return [dst, src, np.swapaxes(self._symbol, axis1=0, axis2=1)]
 
     def scale(self, d):
         N = self._problem.dimN()
@@ -115,7 +128,7 @@ class HockneySolver(SWSolver):
         ns = self._problem.dimNS()
         nd = self._problem.dimND()
         nameroot = self._namebase
-        filename = nameroot
+        filename = self._outputBase()
         nnn = '[' + str(n) + ',' + str(n) + ',' + str(n) + ']'
         ndrange = '[' + str(n-nd) + '..' + str(n-1) + ']'
         ndr3D = '[' + ndrange + ',' + ndrange + ',' + ndrange + ']'
@@ -140,6 +153,7 @@ class HockneySolver(SWSolver):
             print("conf := FFTXGlobals.mdRConv();", file = script_file)
             print("opts := FFTXGlobals.getOpts(conf);", file = script_file)
             print("opts.preProcess := (self, t) >> t;", file = script_file)
+        self._writeCodegenOpts(script_file)
         self._writePrintOpts(script_file)
         print("", file = script_file)
         print('t := let(symvar := var("sym", TPtr(TReal)),', file = script_file)
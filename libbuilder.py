@@ -0,0 +1,141 @@
+"""
+SnowWhite Library Builder Module
+================================
+
+Build one shared library holding many transforms, generated by a single
+SPIRAL run.  The library's metadata lists every transform with its
+function names, so solvers find it with findFunctionsWithMetadata().
+
+Example:
+    builder = LibraryBuilder('dft_pow2')
+    for n in [16, 32, 64]:
+        for k in [SW_FORWARD, SW_INVERSE]:
+            builder.add(DftProblem(n, k))
+    builder.build()
+"""
+
+from snowwhite import *
+from snowwhite.metadata import *
+from snowwhite.libcache import *
+from snowwhite.prebuild import solverClassFor
+
+import datetime
+import os
+import shutil
+
+
+class LibraryBuilder:
+    """Collects problems and builds them into one library."""
+    
+    def __init__(self, name, opts = {}):
+        """Setup multi-transform library.
+        
+        Arguments:
+        name    -- library name, the file is lib<name> in the libraries directory
+        opts    -- solver options applied to every problem
+        """
+        self._name = name
+        self._opts = opts
+        self._solvers = []
+        
+    def add(self, problem, opts = {}):
+        """Add problem to library, with opts overriding the library options."""
+        o = dict(self._opts)
+        o.update(opts)
+        o[SW_OPT_SCRIPTONLY] = True
+        solver = solverClassFor(problem)(problem, o)
+        if solver._namebase in [s._namebase for s in self._solvers]:
+            return
+        if len(self._solvers) > 0:
+            first = self._solvers[0]
+            if (solver._opts.get(SW_OPT_PLATFORM, SW_CPU) != first._opts.get(SW_OPT_PLATFORM, SW_CPU)
+                or solver._withMPI != first._withMPI):
+                raise ValueError('all transforms in a library must have the same platform')
+            if solver._compileFlags() != first._compileFlags():
+                raise ValueError('all transforms in a library must have the same compile profile and SIMD')
+        self._solvers.append(solver)
+        
+    def names(self):
+        """Names of transform functions in the library."""
+        return [s._namebase for s in self._solvers]
+        
+    def _metadata(self):
+        md = dict()
+        md[SW_KEY_SPIRALBUILDINFO] = spiralBuildInfo()
+        md[SW_KEY_TRANSFORMS] = [s._functionMetadata() for s in self._solvers]
+        md[SW_KEY_TRANSFORMTYPES] = sorted(set([f.get(SW_KEY_TRANSFORMTYPE) for f in md[SW_KEY_TRANSFORMS]]))
+        return md
+        
+    def _writeScript(self, filename, builddir):
+        """Write combined SPIRAL script, return its text."""
+        parts = []
+        for solver in self._solvers:
+            # all sources go to the build directory whatever SPIRAL's working directory
+            solver._scriptOutDir = builddir
+            try:
+                parts.append(solver._scriptText())
+            finally:
+                solver._scriptOutDir = None
+        text = '\n'.join(parts)
+        timestr = datetime.datetime.now().strftime("%a %b %d %H:%M:%S %Y")
+        with open(filename, 'w') as script_file:
+            print(file = script_file)
+            print('# SPIRAL script generated by ' + type(self).__name__ + ' for ' + self._name, file = script_file)
+            print('# ' + timestr, file = script_file)
+            print(file = script_file)
+            script_file.write(text)
+        return text
+    
+    def build(self, libdir=None):
+        """Generate, compile, and publish the library, return its path."""
+        if len(self._solvers) == 0:
+            raise ValueError('no transforms added to library ' + self._name)
+        first = self._solvers[0]
+        if libdir == None:
+            libdir = publishDir(first._libsDir)
+            
+        # same lock as solver builds, so concurrent builds of the library don't interleave
+        libname = 'lib' + self._name + SW_SHLIB_EXT
+        with buildLock(libdir, libname):
+            return self._buildLocked(libdir, libname)
+            
+    def _buildLocked(self, libdir, libname):
+        first = self._solvers[0]
+        tempdir = first._makeBuildDir(self._name)
+        try:
+            return self._buildInDir(libdir, libname, tempdir)
+        finally:
+            # optionally remove temp dir, also after a failed build
+            if not first._keeptemp:
+                shutil.rmtree(tempdir, ignore_errors=True)
+                
+    def _buildInDir(self, libdir, libname, tempdir):
+        first = self._solvers[0]
+        script = os.path.join(tempdir, self._name + '.g')
+        text = self._writeScript(script, tempdir)
+        
+        print('Generating ' + str(len(self._solvers)) + ' transforms for ' + self._name, flush = True)
+        if spiralSessionPool() != None:
+            ret = callSpiralWithSession(text)
+        else:
+            ret = callSpiralWithFile(script, tempdir)
+        if ret != SPIRAL_RET_OK:
+            msg = 'SPIRAL error'
+            raise RuntimeError(msg)
+        # metadata records what was generated, the transforms share compile flags
+        for solver in self._solvers:
+            solver._checkGenerated(tempdir, adjustFlags=False)
+        
+        writeMetadataSourceFile(self._metadata(), self._name + SW_METAVAR_EXT,
+            os.path.join(tempdir, self._name + SW_METAFILE_EXT))
+        first._includeMetadata = True
+        
+        installdir = os.path.join(tempdir, 'install')
+        builtlib = first._compile(self._name, tempdir, installdir, self.names())
+        reentrant = [s for s in self._solvers if s._reentrant]
+        if not all([s._checkReentrant(builtlib, tempdir) for s in reentrant]):
+            # metadata must not claim Reentrant for transforms with global state
+            writeMetadataSourceFile(self._metadata(), self._name + SW_METAVAR_EXT,
+                os.path.join(tempdir, self._name + SW_METAFILE_EXT))
+            builtlib = first._compile(self._name, tempdir, installdir, self.names())
+        return publishLibrary(builtlib, libdir, libname)
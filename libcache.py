@@ -0,0 +1,199 @@
+"""
+SnowWhite Library Cache Module
+==============================
+
+Content-addressed cache of compiled transform libraries.  Libraries are
+named by a digest of the generated SPIRAL script, the solver options, and
+the SPIRAL build info, so a library is only reused when all three match.
+
+Builds of the same library are serialized across threads and processes
+with a lock file next to the published library, so one process builds
+and the others wait and then load its result.  Locks use fcntl.lockf,
+which works on NFS, so the cache directory may be shared between nodes.
+"""
+
+from snowwhite import *
+
+import contextlib
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+if sys.platform == 'win32':
+    import msvcrt
+else:
+    import fcntl
+
+# in-process locks, file locks are per process and do not exclude threads
+_threadLocks = dict()
+_threadLocksLock = threading.Lock()
+
+# last-use times of libraries, per directory, for LRU pruning
+SW_USAGE_FILE = '.swusage.json'
+# seconds between recording uses of the same library from one process
+SW_USAGE_INTERVAL = 600
+
+_usageRecorded = dict()
+_usageLock = threading.Lock()
+
+# options that do not change the generated library, or only through the script text
+_NON_BUILD_OPTS = [SW_OPT_ASYNCBUILD, SW_OPT_AUTOTUNE, SW_OPT_BUFFERPOOL, SW_OPT_BUILDER,
+                   SW_OPT_BUILDLOG, SW_OPT_FUSESCALE, SW_OPT_KEEPTEMP, SW_OPT_MAXBATCH,
+                   SW_OPT_MAXWAIT, SW_OPT_RULES, SW_OPT_SCRIPTONLY]
+
+
+def cacheKey(script, opts, buildinfo):
+    """Digest of script text, build options and SPIRAL build info."""
+    h = hashlib.sha256()
+    h.update(script.encode('utf-8'))
+    buildopts = {k:v for k,v in opts.items() if k not in _NON_BUILD_OPTS}
+    h.update(json.dumps(buildopts, sort_keys=True, default=str).encode('utf-8'))
+    h.update(json.dumps(buildinfo, sort_keys=True, default=str).encode('utf-8'))
+    return h.hexdigest()[:SW_CACHEKEY_LEN]
+
+
+def cachedLibraryName(namebase, key):
+    """File name of cached library for transform namebase and cache key."""
+    return 'lib' + namebase + '_' + key + SW_SHLIB_EXT
+
+
+def isCachedLibrary(filename):
+    """True if filename is named like a cache entry."""
+    pat = r'^lib.+_[0-9a-f]{' + str(SW_CACHEKEY_LEN) + '}' + re.escape(SW_SHLIB_EXT) + '$'
+    return re.match(pat, os.path.basename(filename)) != None
+
+
+def findCachedLibrary(namebase, key, dirlist):
+    """Return full path of cached library in first directory that has it, or None."""
+    libname = cachedLibraryName(namebase, key)
+    for libdir in dirlist:
+        path = os.path.join(libdir, libname)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def publishLibrary(srcpath, libdir, libname):
+    """Atomically copy built library into libdir as libname."""
+    os.makedirs(libdir, mode=0o777, exist_ok=True)
+    # copy to temp file in destination directory so final rename is atomic
+    (fd, tmppath) = tempfile.mkstemp(prefix='.' + libname + '.', dir=libdir)
+    os.close(fd)
+    try:
+        shutil.copy2(srcpath, tmppath)
+        os.chmod(tmppath, 0o755)
+        dstpath = os.path.join(libdir, libname)
+        os.replace(tmppath, dstpath)
+    except:
+        if os.path.exists(tmppath):
+            os.remove(tmppath)
+        raise
+    # metadata imports this module
+    from snowwhite.metadata import libraryPublished
+    libraryPublished(dstpath)
+    return dstpath
+
+
+def cacheDirs(libsdir):
+    """Directories searched for cached libraries, in order.
+    
+    These are the package libraries directory, the shared cache directory
+    SW_CACHE_DIR, and the directories in SW_LIBRARY_PATH.
+    """
+    dirlist = [libsdir]
+    cachedir = os.getenv(SW_CACHE_DIR)
+    if cachedir != None:
+        dirlist.append(cachedir)
+    libpath = os.getenv(SW_LIBRARY_PATH)
+    if libpath != None:
+        sep = ';' if sys.platform == 'win32' else ':'
+        dirlist = dirlist + [p for p in libpath.split(sep) if p != '']
+    return dirlist
+
+
+def publishDir(libsdir):
+    """Directory new libraries are published to, SW_CACHE_DIR if set."""
+    return os.getenv(SW_CACHE_DIR, libsdir)
+
+
+def _lockFile(f):
+    if sys.platform == 'win32':
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK gives up after 10 seconds, keep waiting
+                pass
+    else:
+        fcntl.lockf(f, fcntl.LOCK_EX)
+
+
+def _unlockFile(f):
+    if sys.platform == 'win32':
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.lockf(f, fcntl.LOCK_UN)
+
+
+@contextlib.contextmanager
+def buildLock(libdir, libname):
+    """Hold exclusive lock for building libname in libdir, across threads and processes."""
+    os.makedirs(libdir, mode=0o777, exist_ok=True)
+    lockpath = os.path.join(libdir, '.' + libname + '.lock')
+    with _threadLocksLock:
+        tlock = _threadLocks.setdefault(lockpath, threading.Lock())
+    with tlock:
+        # lock file is left in place, removing it would race with waiting processes
+        with open(lockpath, 'a+') as f:
+            _lockFile(f)
+            try:
+                yield
+            finally:
+                _unlockFile(f)
+
+
+def libraryUsage(libdir):
+    """Dict of library file name to last recorded use time, in seconds since the epoch."""
+    try:
+        with open(os.path.join(libdir, SW_USAGE_FILE), 'r') as f:
+            usage = json.load(f)
+    except (OSError, ValueError):
+        return dict()
+    return usage if type(usage) is dict else dict()
+
+
+def writeLibraryUsage(libdir, usage):
+    """Atomically replace usage record of libdir, skipped if directory is read-only."""
+    try:
+        (fd, tmppath) = tempfile.mkstemp(prefix=SW_USAGE_FILE + '.', dir=libdir)
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(usage, f, indent=1, sort_keys=True)
+        os.replace(tmppath, os.path.join(libdir, SW_USAGE_FILE))
+    except OSError:
+        if os.path.exists(tmppath):
+            os.remove(tmppath)
+
+
+def recordLibraryUse(path):
+    """Record that library path was used now, at most every SW_USAGE_INTERVAL seconds per process."""
+    now = time.time()
+    with _usageLock:
+        last = _usageRecorded.get(path)
+        if last != None and now - last < SW_USAGE_INTERVAL:
+            return
+        _usageRecorded[path] = now
+    libdir = os.path.dirname(path)
+    usage = libraryUsage(libdir)
+    usage[os.path.basename(path)] = now
+    writeLibraryUsage(libdir, usage)
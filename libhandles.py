@@ -0,0 +1,124 @@
+"""
+SnowWhite Library Handles Module
+================================
+
+Process-wide registry of loaded transform libraries.  Each library is
+loaded once, and each transform's generated init function is called
+when its first solver acquires it, and its destroy function when the
+last one releases it, so solvers for the same transform share the
+generated global state safely.
+
+Generated code keeps its temporaries in global arrays unless built with
+the reentrant option, so calls to a transform from libraries without
+Reentrant in their metadata are serialized by a lock per transform.
+Calls to threaded transforms set their OpenMP thread count per call.
+"""
+
+import ctypes
+import os
+import threading
+
+# loaded libraries by real path
+_libraries = dict()
+# reference counts of initialized transforms, by (real path, init function name)
+_transforms = dict()
+_handlesLock = threading.RLock()
+
+
+def loadLibrary(path):
+    """Return the ctypes library for path, loading it on first use."""
+    key = os.path.realpath(path)
+    with _handlesLock:
+        lib = _libraries.get(key)
+        if lib == None:
+            lib = ctypes.CDLL(path)
+            _libraries[key] = lib
+        return lib
+
+
+def _libFunc(lib, name):
+    gf = getattr(lib, name, None)
+    if gf == None:
+        msg = 'could not find function: ' + name
+        raise RuntimeError(msg)
+    return gf
+
+
+def acquireTransform(path, initName, destroyName):
+    """Take a reference to a transform, calling its init function if it is the first.
+
+    Returns a key to pass to releaseTransform().
+    """
+    key = (os.path.realpath(path), initName)
+    with _handlesLock:
+        entry = _transforms.get(key)
+        if entry == None:
+            lib = loadLibrary(path)
+            _libFunc(lib, initName)()
+            entry = {'lib' : lib, 'destroy' : destroyName, 'refs' : 0, 'lock' : threading.Lock()}
+            _transforms[key] = entry
+        entry['refs'] += 1
+    return key
+
+
+def releaseTransform(key):
+    """Drop a reference to a transform, calling its destroy function if it was the last."""
+    with _handlesLock:
+        entry = _transforms.get(key)
+        if entry == None:
+            return
+        entry['refs'] -= 1
+        if entry['refs'] > 0:
+            return
+        del _transforms[key]
+        _libFunc(entry['lib'], entry['destroy'])()
+
+
+def transformRefCount(path, initName):
+    """Number of solvers holding a transform, 0 if it is not initialized."""
+    with _handlesLock:
+        entry = _transforms.get((os.path.realpath(path), initName))
+        return 0 if entry == None else entry['refs']
+
+
+def transformLock(key):
+    """Lock serializing calls to a transform acquired with acquireTransform()."""
+    with _handlesLock:
+        return _transforms[key]['lock']
+
+
+class SerializedFunction:
+    """Foreign function called while holding a lock."""
+
+    def __init__(self, func, lock):
+        self._func = func
+        self._lock = lock
+
+    def __call__(self, *args):
+        with self._lock:
+            return self._func(*args)
+
+
+class ThreadCountFunction:
+    """Foreign function called with an OpenMP thread count set for the call.
+
+    omp_set_num_threads() sets the count of the calling thread for all
+    OpenMP code in the process, so the count is set before each call and
+    the previous one restored after, and solvers using different counts
+    from the same thread don't affect each other or other libraries.
+    """
+
+    def __init__(self, func, lib, count):
+        """count is a one-element list, so later changes apply to existing wrappers."""
+        self._func = func
+        self._set = lib.omp_set_num_threads
+        self._get = lib.omp_get_max_threads
+        self._count = count
+
+    def __call__(self, *args):
+        prev = self._get()
+        self._set(self._count[0])
+        try:
+            return self._func(*args)
+        finally:
+            self._set(prev)
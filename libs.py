@@ -0,0 +1,199 @@
+"""
+SnowWhite Library Management Module
+===================================
+
+List, inspect, verify, and prune the shared libraries in the library
+directories.  Pruning removes least recently used libraries until the
+directory fits a byte or count budget.  Last use is recorded when a
+solver loads a library; libraries with no recorded use count as last
+used when they were written.
+
+usage: python -m snowwhite.libs list [--dir DIR]
+       python -m snowwhite.libs inspect LIBRARY
+       python -m snowwhite.libs verify [--dir DIR]
+       python -m snowwhite.libs prune [--dir DIR] [--max-bytes N] [--max-count N] [--dry-run]
+"""
+
+from snowwhite import *
+from snowwhite.libcache import *
+from snowwhite.metadata import *
+
+import argparse
+import ctypes
+import datetime
+import json
+import os
+import sys
+
+_SIZE_SUFFIXES = {'K' : 1 << 10, 'M' : 1 << 20, 'G' : 1 << 30, 'T' : 1 << 40}
+
+
+def defaultLibsDir():
+    """The package libraries directory."""
+    moduleDir = os.path.dirname(os.path.realpath(__file__))
+    return os.path.join(moduleDir, SW_LIBSDIR)
+
+
+def libraryInfo(libdir):
+    """List of dicts describing the libraries in libdir, least recently used first.
+
+    Each dict has the library 'path', its 'size' in bytes, 'lastuse' time
+    in seconds since the epoch, and 'metadata', which may be None.
+    """
+    usage = libraryUsage(libdir)
+    metadata = {d[SW_KEY_FILENAME] : d[SW_KEY_METADATA] for d in metadataInDir(libdir)}
+    infolist = []
+    try:
+        names = os.listdir(libdir)
+    except OSError:
+        return infolist
+    for name in names:
+        if name.startswith('.') or not name.endswith(SW_SHLIB_EXT):
+            continue
+        path = os.path.join(libdir, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        infolist.append({'path' : path, 'size' : st.st_size,
+                         'lastuse' : usage.get(name, st.st_mtime),
+                         'metadata' : metadata.get(path)})
+    infolist.sort(key=lambda info: info['lastuse'])
+    return infolist
+
+
+def _transformSummary(metadata):
+    if metadata == None:
+        return ['(no metadata)']
+    lines = []
+    for xform in metadata.get(SW_KEY_TRANSFORMS, []):
+        lines.append('{} {} {} {} {}'.format(xform.get(SW_KEY_TRANSFORMTYPE),
+            xform.get(SW_KEY_DIMENSIONS), xform.get(SW_KEY_DIRECTION),
+            xform.get(SW_KEY_PRECISION), xform.get(SW_KEY_PLATFORM)))
+    return lines
+
+
+def verifyLibrary(path):
+    """Return list of problems found with library, empty if it is usable."""
+    problems = []
+    try:
+        metadata = metadataInFile(path)
+    except ValueError as ex:
+        return ['bad metadata: ' + str(ex)]
+    if metadata == None:
+        problems.append('no metadata')
+    try:
+        lib = ctypes.CDLL(path)
+    except OSError as ex:
+        return problems + ['cannot load: ' + str(ex)]
+    if metadata != None:
+        for xform in metadata.get(SW_KEY_TRANSFORMS, []):
+            names = xform.get(SW_KEY_NAMES, {})
+            for key in [SW_KEY_EXEC, SW_KEY_INIT, SW_KEY_DESTROY]:
+                name = names.get(key)
+                if name == None or getattr(lib, name, None) == None:
+                    problems.append('missing ' + key + ' function ' + str(name))
+    return problems
+
+
+def pruneLibraries(libdir, maxBytes=None, maxCount=None, dryRun=False):
+    """Remove least recently used libraries until libdir is within budget.
+
+    Build lock files are left in place, removing them would race with
+    processes waiting on them, and the directory's usage record and
+    metadata index are rewritten.
+    Returns the list of paths removed, or that would be removed if dryRun.
+    """
+    infolist = libraryInfo(libdir)
+    total = sum([info['size'] for info in infolist])
+    count = len(infolist)
+    removed = []
+    for info in infolist:
+        overBytes = maxBytes != None and total > maxBytes
+        overCount = maxCount != None and count > maxCount
+        if not (overBytes or overCount):
+            break
+        if not dryRun:
+            try:
+                os.remove(info['path'])
+            except OSError as ex:
+                print('could not remove ' + info['path'] + ': ' + str(ex), file=sys.stderr)
+                continue
+        removed.append(info['path'])
+        total -= info['size']
+        count -= 1
+    if len(removed) > 0 and not dryRun:
+        # rewrite usage record and directory index to the libraries left, drop registries
+        present = set([os.path.basename(info['path']) for info in libraryInfo(libdir)])
+        usage = libraryUsage(libdir)
+        writeLibraryUsage(libdir, {k:v for k,v in usage.items() if k in present})
+        metadataInDir(libdir)
+        invalidateMetadataRegistry()
+    return removed
+
+
+def parseSize(text):
+    """Byte count from text like '500M' or '2G'."""
+    text = text.strip().upper().rstrip('B')
+    if len(text) > 0 and text[-1] in _SIZE_SUFFIXES:
+        return int(float(text[:-1]) * _SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def _timeStr(t):
+    return datetime.datetime.fromtimestamp(t).strftime('%Y-%m-%d %H:%M')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m snowwhite.libs',
+        description='Manage SnowWhite transform libraries.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('list', help='list libraries and their transforms')
+    p.add_argument('--dir', default=None, help='library directory (default: all search directories)')
+    p = sub.add_parser('inspect', help='print metadata of a library')
+    p.add_argument('library')
+    p = sub.add_parser('verify', help='check libraries load and have the functions in their metadata')
+    p.add_argument('--dir', default=None, help='library directory (default: all search directories)')
+    p = sub.add_parser('prune', help='remove least recently used libraries')
+    p.add_argument('--dir', default=None, help='library directory (default: where new libraries are published)')
+    p.add_argument('--max-bytes', type=parseSize, default=None, help='size budget, e.g. 500M or 2G')
+    p.add_argument('--max-count', type=int, default=None, help='maximum number of libraries')
+    p.add_argument('--dry-run', action='store_true', help='only print what would be removed')
+    args = parser.parse_args(argv)
+
+    if args.command == 'inspect':
+        metadata = metadataInFile(args.library)
+        if metadata == None:
+            print('no metadata in ' + args.library, file=sys.stderr)
+            return 1
+        print(json.dumps(metadata, indent=2, sort_keys=True))
+        return 0
+
+    if args.command == 'prune':
+        if args.max_bytes == None and args.max_count == None:
+            parser.error('prune needs --max-bytes or --max-count')
+        libdir = args.dir if args.dir != None else publishDir(defaultLibsDir())
+        removed = pruneLibraries(libdir, args.max_bytes, args.max_count, args.dry_run)
+        for path in removed:
+            print(('would remove ' if args.dry_run else 'removed ') + path)
+        return 0
+
+    dirlist = [args.dir] if args.dir != None else cacheDirs(defaultLibsDir())
+    status = 0
+    for libdir in dirlist:
+        for info in libraryInfo(libdir):
+            if args.command == 'list':
+                print('{}  {:>10}  {}'.format(_timeStr(info['lastuse']), info['size'], info['path']))
+                for line in _transformSummary(info['metadata']):
+                    print('    ' + line)
+            else:
+                problems = verifyLibrary(info['path'])
+                print(('OK      ' if len(problems) == 0 else 'FAILED  ') + info['path'])
+                for problem in problems:
+                    print('    ' + problem)
+                    status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
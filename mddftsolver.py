@@ -58,24 +58,49 @@ class MddftSolver(SWSolver):
         
     def _trace(self):
         pass
+        
+    def buildTestInput(self):
+        """Random input for this problem."""
+        dims = tuple(self._problem.dimensions())
+        cxtype = np.csingle if self._opts.get(SW_OPT_REALCTYPE) == "float" else np.cdouble
+        ordc = 'F' if self._colMajor else 'C'
+        src = np.asarray(np.random.random(dims) + np.random.random(dims) * 1j, cxtype, order=ordc)
+        if self._genCuda or self._genHIP:
+            src = cp.asarray(src)
+        return src
 
     def solve(self, src, dst=None):
-        """Call SPIRAL-generated function."""
-   
+        """Call SPIRAL-generated function, in-place if the inplace option is set."""
+        
+        dst = self._inplaceDst(src, dst)
+        if not self.ready():
+            return self._solveDef(dst, src)
         if type(dst) == type(None):
-            xp = get_array_module(src)
-            nt = tuple(self._problem.dimensions())
-            ordc = 'F' if self._colMajor else 'C'
-            dst = xp.zeros(nt, src.dtype,  order=ordc)
+            dst = self._newDst(src)
             
         self._func(dst, src)
-        if self._problem.direction() == SW_INVERSE:
+        self._postProcess(dst)
+        return dst
+        
+    def _newDst(self, src):
+        xp = get_array_module(src)
+        nt = tuple(self._problem.dimensions())
+        ordc = 'F' if self._colMajor else 'C'
+        return self._newArray(xp, nt, src.dtype, ordc)
+        
+    def _normalized(self):
+        return self._fuseScale and self._problem.direction() == SW_INVERSE
+        
+    def _supportsInplace(self):
+        return True
+        
+    def _postProcess(self, dst):
+        if self._problem.direction() == SW_INVERSE and not self._normalized():
             xp = get_array_module(dst)
             xp.divide(dst, xp.size(dst), out=dst)
-        return dst
 
     def _writeScript(self, script_file):
-        filename = self._namebase
+        filename = self._outputBase()
         nameroot = self._namebase
         dims = str(self._problem.dimensions())
         filetype = '.c'
@@ -96,15 +121,19 @@ class MddftSolver(SWSolver):
         print('', file = script_file)
         print("t := let(ns := " + dims + ",", file = script_file) 
         print('    name := "' + nameroot + '",', file = script_file)
+        mddft = "MDDFT(ns, " + str(self._problem.direction()) + ")"
+        if self._normalized():
+            mddft = "Scale(1/" + str(np.prod(self._problem.dimensions())) + ", " + mddft + ")"
+        mddft = self._inplaceSpec(mddft)
         # -1 is inverse for Numpy and forward (1) for Spiral
         if self._colMajor:
-            print("    TFCallF(TRC(MDDFT(ns, " + str(self._problem.direction()) + ")),", file = script_file)
+            print("    TFCallF(TRC(" + mddft + "),", file = script_file)
             print("        rec(fname := name,", file = script_file)
             print("            params := [],", file = script_file)
             print("            Xtype := TArrayNDF(TComplex, ns),", file = script_file)
             print("            Ytype := TArrayNDF(TComplex, ns)))", file = script_file)
         else:
-            print("    TFCall(MDDFT(ns, " + str(self._problem.direction()) + "), rec(fname := name, params := []))", file = script_file)
+            print("    TFCall(" + mddft + ", rec(fname := name, params := []))", file = script_file)
         print(");", file = script_file)        
 
         print('', file = script_file)
@@ -115,6 +144,7 @@ class MddftSolver(SWSolver):
         if self._opts.get(SW_OPT_REALCTYPE) == "float":
             print('opts.TRealCtype := "float";', file = script_file)
 
+        self._writeCodegenOpts(script_file)
         self._writePrintOpts(script_file)
 
         print('Add(opts.includes, "<float.h>");',  file = script_file)
@@ -72,6 +72,24 @@ class MdprdftSolver(SWSolver):
         
     def dimensionsCX(self):
         return self._cxns
+        
+    def paddedDimensions(self):
+        """Dimensions of real array for in-place transforms, last one padded to 2*(n//2+1)."""
+        dims = list(self._problem.dimensions())
+        dims[-1] = 2 * (dims[-1] // 2 + 1)
+        return dims
+        
+    def newInplaceBuffer(self):
+        """Array to fill with input for an in-place transform.
+        
+        For forward transforms this is the padded real array, with the input
+        in [..., :n]; for inverse transforms the complex array, whose memory
+        holds the padded real output.
+        """
+        xp = cp if self._genCuda or self._genHIP else np
+        if self._problem.direction() == SW_FORWARD:
+            return xp.zeros(tuple(self.paddedDimensions()), self._ftype)
+        return xp.zeros(tuple(self._cxns), self._cxtype)
 
     def runDef(self, src):
         """Solve using internal Python definition."""
@@ -100,29 +118,101 @@ class MdprdftSolver(SWSolver):
         
     def _trace(self):
         pass
+        
+    def buildTestInput(self):
+        """Random input for this problem, reals for forward, complex for inverse."""
+        ordc = 'F' if self._colMajor else 'C'
+        if self._problem.direction() == SW_FORWARD:
+            dims = tuple(self._problem.dimensions())
+            src = np.asarray(np.random.random(dims), self._ftype, order=ordc)
+        else:
+            dims = tuple(self.dimensionsCX())
+            src = np.asarray(np.random.random(dims) + np.random.random(dims) * 1j, self._cxtype, order=ordc)
+        if self._genCuda or self._genHIP:
+            src = cp.asarray(src)
+        if self._inplace:
+            buf = self.newInplaceBuffer()
+            buf[..., :src.shape[-1]] = src
+            return buf
+        return src
 
     def solve(self, src, dst=None):
-        """Call SPIRAL-generated function."""
+        """Call SPIRAL-generated function.
         
+        In-place solvers take the array from newInplaceBuffer() and return
+        a view of its memory: complex for forward, real [..., :n] for inverse.
+        """
+        if self._inplace:
+            return self._solveInplace(src, dst)
+        if dst is src:
+            raise ValueError('dst is src, the solver must be created with the inplace option')
+        if not self.ready():
+            return self._solveDef(dst, src)
         if type(dst) == type(None):
-            xp = get_array_module(src)
-            if self._problem.direction() == SW_FORWARD:
-                nt = tuple(self.dimensionsCX())
-                rtype = self._cxtype
-            else:
-                nt = tuple(self._problem.dimensions())
-                rtype = self._ftype
-            ordc = 'F' if self._colMajor else 'C'
-            dst = xp.zeros(nt, rtype,  order=ordc)
+            dst = self._newDst(src)
             
         self._func(dst, src)
-        if self._problem.direction() == SW_INVERSE:
-            xp = get_array_module(dst)
-            xp.divide(dst, xp.size(dst), out=dst)
+        self._postProcess(dst)
+        return dst
+        
+    def _supportsInplace(self):
+        return not self._colMajor
+        
+    def _inplaceDst(self, src, dst):
+        """Padded view of src that the in-place function writes."""
+        if not self._inplace:
+            return super(MdprdftSolver, self)._inplaceDst(src, dst)
+        if type(dst) != type(None) and dst is not src:
+            raise ValueError('in-place solver writes its result to src, dst must be None or src')
+        if self._problem.direction() == SW_FORWARD:
+            shape, dtype, outtype = self.paddedDimensions(), self._ftype, self._cxtype
+        else:
+            shape, dtype, outtype = self._cxns, self._cxtype, self._ftype
+        if tuple(src.shape) != tuple(shape) or src.dtype != dtype or not src.flags.c_contiguous:
+            raise ValueError('in-place transform needs a C-ordered ' + np.dtype(dtype).name +
+                ' array of shape ' + str(tuple(shape)) + ', see newInplaceBuffer()')
+        return src.view(outtype)
+        
+    def _resultView(self, dst):
+        """Inverse in-place results are the real [..., :n] part of the padded array."""
+        if self._inplace and self._problem.direction() == SW_INVERSE:
+            return dst[..., :self._problem.dimensions()[-1]]
         return dst
+        
+    def _solveInplace(self, src, dst):
+        out = self._inplaceDst(src, dst)
+        result = self._resultView(out)
+        inp = src
+        if self._problem.direction() == SW_FORWARD:
+            inp = src[..., :self._problem.dimensions()[-1]]
+        if not self.ready():
+            return self._solveDef(result, inp)
+        self._func(out, src)
+        self._postProcess(out)
+        return result
+        
+    def _newDst(self, src):
+        xp = get_array_module(src)
+        if self._problem.direction() == SW_FORWARD:
+            nt = tuple(self.dimensionsCX())
+            rtype = self._cxtype
+        else:
+            nt = tuple(self._problem.dimensions())
+            rtype = self._ftype
+        ordc = 'F' if self._colMajor else 'C'
+        return self._newArray(xp, nt, rtype, ordc)
+        
+    def _normalized(self):
+        return self._fuseScale and self._problem.direction() == SW_INVERSE
+        
+    def _postProcess(self, dst):
+        if self._problem.direction() == SW_INVERSE and not self._normalized():
+            # padding of in-place arrays is not part of the transform size
+            xp = get_array_module(dst)
+            xp.divide(dst, np.prod(self._problem.dimensions()), out=dst)
 
     def _writeScript(self, script_file):
-        filename = self._namebase
+        filename = self._outputBase()
         nameroot = self._namebase
         dims = str(self._problem.dimensions())
         filetype = '.c'
@@ -134,6 +224,10 @@ class MdprdftSolver(SWSolver):
         xform = "MDPRDFT"
         if self._problem.direction() == SW_INVERSE:
             xform = "IMDPRDFT"
+        xform = xform + "(ns, " + str(self._problem.direction()) + ")"
+        if self._normalized():
+            xform = "Scale(1/" + str(np.prod(self._problem.dimensions())) + ", " + xform + ")"
+        xform = self._inplaceSpec(xform)
         
         print("Load(fftx);", file = script_file)
         print("ImportAll(fftx);", file = script_file) 
@@ -155,13 +249,27 @@ class MdprdftSolver(SWSolver):
                 xtype = 'Xtype := TArrayNDF(TReal, ns)'
                 ytype = 'Ytype := TArrayNDF_ConjEven(TComplex, ns)'
         
-            print('  TFCallF(' + xform + '(ns, ' + str(self._problem.direction()) + '),', file = script_file)
+            print('  TFCallF(' + xform + ',', file = script_file)
             print('    rec(fname := name,', file = script_file)
             print('        params := [],', file = script_file)
             print('        ' + xtype + ',', file = script_file)
             print('        ' + ytype + '))', file = script_file)
+        elif self._inplace:
+            # in-place real data is padded to the size of the complex data
+            padded = str(self.paddedDimensions())
+            if self._problem.direction() == SW_INVERSE:
+                xtype = 'Xtype := TArrayND_ConjEven(TComplex, ns)'
+                ytype = 'Ytype := TArrayND(TReal, ' + padded + ')'
+            else:
+                xtype = 'Xtype := TArrayND(TReal, ' + padded + ')'
+                ytype = 'Ytype := TArrayND_ConjEven(TComplex, ns)'
+            print('    TFCall(' + xform + ',', file = script_file)
+            print('        rec(fname := name,', file = script_file)
+            print('            params := [],', file = script_file)
+            print('            ' + xtype + ',', file = script_file)
+            print('            ' + ytype + '))', file = script_file)
         else:
-            print("    TFCall(" + xform + "(ns, " + str(self._problem.direction()) + "), rec(fname := name, params := []))", file = script_file)
+            print("    TFCall(" + xform + ", rec(fname := name, params := []))", file = script_file)
         print(");", file = script_file)        
 
         print("opts := conf.getOpts(t);", file = script_file)
@@ -171,6 +279,7 @@ class MdprdftSolver(SWSolver):
         if self._opts.get(SW_OPT_REALCTYPE) == "float":
             print('opts.TRealCtype := "float";', file = script_file)
 
+        self._writeCodegenOpts(script_file)
         self._writePrintOpts(script_file)
 
         print("tt := opts.tagIt(t);", file = script_file)
@@ -63,6 +63,9 @@ class MdrconvSolver(SWSolver):
         for i in range(len(self._callGraph)-1):
             self._callGraph[i] = self._callGraph[i] + ','
             
+    def _traceFromProblem(self):
+        return True
+            
     def runDef(self, src, sym):
         """Solve using internal Python definition."""
         
@@ -75,21 +78,52 @@ class MdrconvSolver(SWSolver):
     def solve(self, src, sym, dst=None):
         """Call SPIRAL-generated code"""
         
-        xp = sw.get_array_module(src)
-        
-        #slice sym if it's a cube
-        shape = sym.shape
-        if shape[0] == shape[2]:
-            N = shape[0]
-            Nx = (N // 2) + 1
-            sym = xp.ascontiguousarray(sym[:, :, :Nx])
+        if not self.ready():
+            return self._solveDef(dst, src, self._symArg(sym))
                 
-        N = self._problem.dimN()        
+        sym = self._symArg(sym)
         if type(dst) == type(None):
-            dst = xp.zeros((N,N,N), src.dtype)
+            dst = self._newDst(src)
         self._func(dst, src, sym)
-        xp.divide(dst, N**3, out=dst)
+        self._postProcess(dst)
         return dst
+        
+    def _symArg(self, sym):
+        """Slice sym to the half cube the transform reads if it's a full cube."""
+        shape = sym.shape
+        if shape[0] != shape[2]:
+            return sym
+        Nx = (shape[0] // 2) + 1
+        # copy into workspace, reused across calls when there is a buffer pool
+        xp = sw.get_array_module(sym)
+        ws = self._newArray(xp, (shape[0], shape[1], Nx), sym.dtype, zero=False)
+        ws[...] = sym[:, :, :Nx]
+        return ws
+        
+    def _newDst(self, src):
+        xp = sw.get_array_module(src)
+        N = self._problem.dimN()
+        return self._newArray(xp, (N,N,N), src.dtype)
+        
+    def _nativeArgs(self, dst, src, sym):
+        return [dst, src, self._symArg(sym)]
+        
+    def _updateNativeArgs(self, args, dst, src, sym):
+        if args[2] is not sym:
+            args[2][...] = sym[:, :, :args[2].shape[2]]
+        
+    def _scaleDivisor(self):
+        N = self._problem.dimN()
+        return N**3
+        
+    def _normalized(self):
+        return self._fuseScale
+        
+    def _postProcess(self, dst):
+        if self._normalized():
+            return
+        xp = sw.get_array_module(dst)
+        xp.divide(dst, self._scaleDivisor(), out=dst)
  
     def _func(self, dst, src, sym):
         """Call the SPIRAL generated main function"""
@@ -116,7 +150,7 @@ class MdrconvSolver(SWSolver):
 
     def _writeScript(self, script_file):
         nameroot = self._namebase
-        filename = nameroot
+        filename = self._outputBase()
         filetype = '.c'
         if self._genCuda:
             filetype = '.cu'
@@ -136,10 +170,14 @@ class MdrconvSolver(SWSolver):
         print("", file = script_file)
         print('t := let(symvar := var("sym", TPtr(TReal)),', file = script_file)
         print("    TFCall(", file = script_file)
-        print("        Compose([", file = script_file)
+        if self._normalized():
+            # normalize in the generated code, so the output is written only once
+            print("        Scale(1/" + str(self._scaleDivisor()) + ", Compose([", file = script_file)
+        else:
+            print("        Compose([", file = script_file)
         for i in range(len(self._callGraph)):
             print("            " + self._callGraph[i], file = script_file)
-        print("        ]),", file = script_file)
+        print("        ])" + (")" if self._normalized() else "") + ",", file = script_file)
         print('        rec(fname := "' + nameroot + '", params := [symvar])', file = script_file)
         print("    )", file = script_file)
         print(");", file = script_file)
@@ -152,6 +190,7 @@ class MdrconvSolver(SWSolver):
         if self._opts.get(SW_OPT_REALCTYPE) == "float":
             print('opts.TRealCtype := "float";', file = script_file)
 
+        self._writeCodegenOpts(script_file)
         self._writePrintOpts(script_file)
 
         print("tt := opts.tagIt(t);", file = script_file)
@@ -1,36 +1,185 @@
 
 from snowwhite import *
+from snowwhite.libcache import cacheDirs
 
 import json
-import glob
+import mmap
 import os
-import sys
+import struct
+import tempfile
+import threading
 
-def metadataInFile(filename):
-    """extract metadata from binary file."""
+# per-directory index of library metadata, keyed by file name, checked by size and mtime
+SW_INDEX_FILE = '.swindex.json'
+_INDEX_VERSION = 1
+
+# in-process registries of transform metadata, one per list of search directories
+_registries = dict()
+_registriesLock = threading.Lock()
+
+
+def _elfSection(buff, name):
+    """Return (offset, size) of named section in ELF image, or None."""
+    if len(buff) < 64 or buff[:4] != b'\x7fELF':
+        return None
+    is64 = (buff[4] == 2)
+    end = '<' if buff[5] == 1 else '>'
+    try:
+        if is64:
+            (shoff,) = struct.unpack_from(end + 'Q', buff, 0x28)
+            (shentsize, shnum, shstrndx) = struct.unpack_from(end + 'HHH', buff, 0x3A)
+            shfmt = end + 'IIQQQQIIQQ'
+        else:
+            (shoff,) = struct.unpack_from(end + 'I', buff, 0x20)
+            (shentsize, shnum, shstrndx) = struct.unpack_from(end + 'HHH', buff, 0x2E)
+            shfmt = end + 'IIIIIIIIII'
+        if shoff == 0:
+            return None
+        # large section counts are kept in the first section header
+        sh0 = struct.unpack_from(shfmt, buff, shoff)
+        if shnum == 0:
+            shnum = sh0[5]
+        if shstrndx == 0xFFFF:
+            shstrndx = sh0[6]
+        headers = [struct.unpack_from(shfmt, buff, shoff + i * shentsize) for i in range(shnum)]
+        stroff = headers[shstrndx][4]
+        bname = bytes(name, 'utf-8') + b'\0'
+        for sh in headers:
+            if buff[stroff + sh[0] : stroff + sh[0] + len(bname)] == bname:
+                return (sh[4], sh[5])
+    except (struct.error, IndexError):
+        return None
+    return None
+
+
+def _metadataInBuffer(buff, start, end):
+    """Parse metadata between markers in buff[start:end], or None."""
     bstr = bytes(SW_METADATA_START, 'utf-8')
     estr = bytes(SW_METADATA_END, 'utf-8')
+    b = buff.find(bstr, start, end)
+    if b < 0:
+        return None
+    b = b + len(bstr)
+    e = buff.find(estr, b, end)
+    if e < 0:
+        return None
+    return json.loads(buff[b:e])
+    
+    
+def metadataInFile(filename):
+    """extract metadata from binary file.
+    
+    The file is memory mapped.  Metadata is read from its own ELF section
+    when there is one, so only those pages are touched, else found by
+    scanning for the markers, as in libraries built by older versions.
+    """
     with open(filename, 'rb') as f:
-        buff = f.read()
-        if bstr in buff:
-            b = buff.find(bstr) + len(bstr)
-            e = buff.find(estr)
-            metabytes = buff[b:e]
-            metaobj = json.loads(metabytes)
-            return metaobj
-        else:
+        try:
+            buff = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty file
             return None
+        with buff:
+            section = _elfSection(buff, SW_METASECTION)
+            if section != None:
+                (offset, size) = section
+                metaobj = _metadataInBuffer(buff, offset, offset + size)
+                if metaobj != None:
+                    return metaobj
+            return _metadataInBuffer(buff, 0, len(buff))
+
+
+def _fileStamp(st):
+    return [st.st_size, st.st_mtime_ns]
 
 
-def metadataInDir(path):
-    """Assemble metadata from shared library files in directory."""
+def _readIndex(path):
+    """Return index entries of directory, empty if there is no usable index."""
+    try:
+        with open(os.path.join(path, SW_INDEX_FILE), 'r') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return dict()
+    if not type(index) is dict or index.get('version') != _INDEX_VERSION:
+        return dict()
+    return index.get('entries', dict())
+
+
+def _writeIndex(path, entries):
+    """Atomically replace index of directory, skipped if directory is read-only."""
+    try:
+        (fd, tmpfile) = tempfile.mkstemp(prefix=SW_INDEX_FILE + '.', dir=path)
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version' : _INDEX_VERSION, 'entries' : entries}, f, sort_keys=True)
+        os.replace(tmpfile, os.path.join(path, SW_INDEX_FILE))
+    except OSError:
+        if os.path.exists(tmpfile):
+            os.remove(tmpfile)
+
+
+def _indexEntry(filename, st):
+    return {'stamp' : _fileStamp(st), 'metadata' : metadataInFile(filename)}
+
+
+def indexLibrary(filename):
+    """Add or update library file in the index of its directory, return its metadata."""
+    path = os.path.dirname(filename)
+    entries = _readIndex(path)
+    entry = _indexEntry(filename, os.stat(filename))
+    entries[os.path.basename(filename)] = entry
+    _writeIndex(path, entries)
+    return entry.get('metadata')
+    
+    
+def libraryPublished(filename):
+    """Update the directory index and in-process registries for a new library."""
+    metaobj = indexLibrary(filename)
+    registerLibrary(filename, metaobj)
+
+
+def metadataInDir(path, known=None):
+    """Assemble metadata from shared library files in directory.
+    
+    Metadata is read from the directory index, only libraries that are new
+    or whose size or mtime changed are read, and the index is updated.
+    known, if given, maps library file names to index entries already
+    read, and is updated, so libraries are not read again when the index
+    can't be written, e.g. in a read-only directory.
+    """
     metalist = []
-    filepat = os.path.join(path, '*' + SW_SHLIB_EXT)
-    files = glob.glob(filepat)
-    for filename in files:
-        metaobj = metadataInFile(filename)
+    try:
+        names = sorted(os.listdir(path))
+    except OSError:
+        return metalist
+    entries = _readIndex(path)
+    current = dict()
+    changed = False
+    for name in names:
+        # temp files being published start with '.'
+        if name.startswith('.') or not name.endswith(SW_SHLIB_EXT):
+            continue
+        filename = os.path.join(path, name)
+        try:
+            st = os.stat(filename)
+        except OSError:
+            continue
+        entry = entries.get(name)
+        if entry == None or entry.get('stamp') != _fileStamp(st):
+            entry = known.get(filename) if known != None else None
+            if entry == None or entry.get('stamp') != _fileStamp(st):
+                entry = _indexEntry(filename, st)
+            changed = True
+        if known != None:
+            known[filename] = entry
+        current[name] = entry
+        metaobj = entry.get('metadata')
         if metaobj != None:
             metalist.append({SW_KEY_FILENAME:filename, SW_KEY_METADATA:metaobj})
+    if changed or len(current) != len(entries):
+        _writeIndex(path, current)
     return metalist
 
 
@@ -44,16 +193,26 @@ def writeMetadataSourceFile(metadata, varname, path, spaces=0):
     metastr = json.dumps(metadata, sort_keys=True, indent=spaces)
     metastr = metastr.replace('"', '\\"') + '\\'
     metastr = metastr.replace('\n', '\\\n')
-    print('char *' + varname + ' = "' + SW_METADATA_START + '\\', file = metadata_file)  
+    # keep the string in its own section on ELF platforms, so readers can find it without scanning
+    print('#if defined(__ELF__)', file = metadata_file)
+    print('__attribute__((section("' + SW_METASECTION + '"), used))', file = metadata_file)
+    print('#endif', file = metadata_file)
+    print('static const char ' + varname + '_str[] = "' + SW_METADATA_START + '\\', file = metadata_file)  
     print(metastr, file = metadata_file) 
     print(SW_METADATA_END + '";', file = metadata_file)  
+    print('char *' + varname + ' = (char *)' + varname + '_str;', file = metadata_file)
     metadata_file.close()
     
     
 def metadataMatches(metadata, metavals):
+    """True if metadata has all key values in metavals, a None value matches only a missing key."""
     if len(metavals) < 1:
         return False
     for k,v in metavals.items():
+        if v == None:
+            if metadata.get(k) != None:
+                return False
+            continue
         if not k in metadata:
             return False
         if v != metadata[k]:
@@ -61,37 +220,151 @@ def metadataMatches(metadata, metavals):
     return True
     
     
-def findFunctionsWithMetadata(metavals, libdir=None):
-    """Search for matching metadata in libraries."""
-    if not type(metavals) is dict:
-        return(None, None)
+def _valueKey(obj, keys):
+    """Hashable key of the values in obj for keys, a missing key counts as None."""
+    return tuple([json.dumps(obj.get(k), sort_keys=True) for k in keys])
+    
+    
+class MetadataRegistry:
+    """Transforms in the libraries of a list of directories, with hashed lookup.
+    
+    For each set of keys searched on, the transforms are indexed once by
+    their values for those keys, so later searches are dictionary hits.
+    Matching is the same as metadataMatches().
+    """
+    
+    def __init__(self, dirlist):
+        self._dirlist = list(dirlist)
+        self._realdirs = [os.path.realpath(d) for d in dirlist]
+        self._entries = None
+        self._indexes = dict()
+        # index entries by library file, for directories whose index can't be written
+        self._known = dict()
+        self._lock = threading.Lock()
+        
+    def refresh(self):
+        """Rescan the directories and drop the indexes."""
+        entries = []
+        for libdir in self._dirlist:
+            for filedict in metadataInDir(libdir, self._known):
+                entries += self._fileEntries(filedict.get(SW_KEY_FILENAME), filedict.get(SW_KEY_METADATA))
+        with self._lock:
+            self._entries = entries
+            self._indexes = dict()
+            
+    def invalidate(self):
+        """Discard everything, the next search rescans."""
+        with self._lock:
+            self._entries = None
+            self._indexes = dict()
+            
+    def add(self, filename, metaobj):
+        """Add or replace the transforms of one library."""
+        new = self._fileEntries(filename, metaobj)
+        with self._lock:
+            if self._entries == None:
+                return
+            if any([e[0] == filename for e in self._entries]):
+                self._entries = [e for e in self._entries if e[0] != filename] + new
+                self._indexes = dict()
+                return
+            self._entries += new
+            for (keys, index) in self._indexes.items():
+                for entry in new:
+                    index.setdefault(_valueKey(entry[1], keys), []).append(entry)
+                    
+    def _fileEntries(self, filename, metaobj):
+        if metaobj == None:
+            return []
+        return [(filename, xform) for xform in metaobj.get(SW_KEY_TRANSFORMS, [])]
+        
+    def find(self, metavals, skipfile=None):
+        """Return (filename, transform metadata) of first match, or None."""
+        if self._entries == None:
+            self.refresh()
+        keys = tuple(sorted(metavals.keys()))
+        with self._lock:
+            index = self._indexes.get(keys)
+            if index == None:
+                index = dict()
+                for entry in self._entries:
+                    index.setdefault(_valueKey(entry[1], keys), []).append(entry)
+                self._indexes[keys] = index
+            candidates = list(index.get(_valueKey(metavals, keys), []))
+        for (filename, xform) in candidates:
+            if skipfile != None and skipfile(filename):
+                continue
+            return (filename, xform)
+        return None
+        
+    def covers(self, filename):
+        """True if filename is in one of the registry's directories."""
+        return os.path.dirname(os.path.realpath(filename)) in self._realdirs
         
-    transformType = metavals.get(SW_KEY_TRANSFORMTYPE)
-    if transformType == None:
-        return(None, None)    
         
+def metadataRegistry(libdir=None):
+    """Registry for libdir and the other library search directories."""
     if libdir == None:
         moduleDir = os.path.dirname(os.path.realpath(__file__))
         libdir = os.path.join(moduleDir, SW_LIBSDIR)
+    dirlist = tuple(cacheDirs(libdir))
+    with _registriesLock:
+        registry = _registries.get(dirlist)
+        if registry == None:
+            registry = MetadataRegistry(dirlist)
+            _registries[dirlist] = registry
+        return registry
         
-    dirlist = [libdir]
-    
-    libpath = os.getenv(SW_LIBRARY_PATH)
-    if libpath != None:
-        sep = ';' if sys.platform == 'win32' else ':'
-        paths = libpath.split(sep)
-        dirlist = dirlist + paths
         
-    for libdir in dirlist:    
-        mdlist = metadataInDir(libdir)
-        for filedict in mdlist:
-            filemd = filedict.get(SW_KEY_METADATA, {})
-            if transformType not in filemd.get(SW_KEY_TRANSFORMTYPES, []):
-                continue
-            for xform in filemd.get(SW_KEY_TRANSFORMS, []):
-                if metadataMatches(xform, metavals):
-                    return(filedict.get(SW_KEY_FILENAME), xform.get(SW_KEY_NAMES, {}))
+def registerLibrary(filename, metaobj=None):
+    """Add a new or rebuilt library to the registries that search its directory."""
+    if metaobj == None:
+        metaobj = metadataInFile(filename)
+    with _registriesLock:
+        registries = list(_registries.values())
+    for registry in registries:
+        if registry.covers(filename):
+            registry.add(filename, metaobj)
+            
             
-    return (None, None)
+def refreshMetadataRegistry():
+    """Rescan library directories of all registries."""
+    with _registriesLock:
+        registries = list(_registries.values())
+    for registry in registries:
+        registry.refresh()
+        
+        
+def invalidateMetadataRegistry():
+    """Discard all registries, for example after libraries were removed."""
+    with _registriesLock:
+        _registries.clear()
+        
+    
+def findFunctionsWithMetadata(metavals, libdir=None, skipfile=None):
+    """Search for matching metadata in libraries.
+    
+    skipfile, if given, is called with each library file name and
+    libraries for which it returns True are not considered.  Searches go
+    through the in-process registry, which is rescanned when there is no
+    match or the matching library has gone, to see libraries built by
+    other processes.
+    """
+    if not type(metavals) is dict or len(metavals) < 1:
+        return(None, None)
+        
+    transformType = metavals.get(SW_KEY_TRANSFORMTYPE)
+    if transformType == None:
+        return(None, None)    
+        
+    registry = metadataRegistry(libdir)
+    found = registry.find(metavals, skipfile)
+    if found == None or not os.path.exists(found[0]):
+        registry.refresh()
+        found = registry.find(metavals, skipfile)
+    if found == None:
+        return (None, None)
+    (filename, xform) = found
+    return (filename, xform.get(SW_KEY_NAMES, {}))
 
 
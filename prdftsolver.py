@@ -90,7 +90,7 @@ class PrdftSolver(SWSolver):
     def _trace(self):
         pass
         
-    def _new_dst(self, src):
+    def _newDst(self, src):
         xp = get_array_module(src)
         Nx = self._problem.dimN()
         typ = self._ftype
@@ -102,18 +102,22 @@ class PrdftSolver(SWSolver):
             dims = bdims + [Nx]
         else:
             dims = [Nx] + bdims
-        dst = xp.zeros(dims, typ)
+        dst = self._newArray(xp, dims, typ)
         return dst
 
     def solve(self, src, dst=None):
         """Call SPIRAL-generated function."""
+        if not self.ready():
+            # inverse library output is not normalized
+            scale = self._problem.dimN() if self._problem.direction() == SW_INVERSE else 1
+            return self._solveDef(dst, src, scale=scale)
         if type(dst) == type(None):
-            dst = self._new_dst(src)
+            dst = self._newDst(src)
         self._func(dst, src)
         return dst
 
     def _writeScript(self, script_file):
-        filename = self._namebase
+        filename = self._outputBase()
         nameroot = self._namebase
         filetype = '.c'
         if self._genCuda:
@@ -162,6 +166,7 @@ class PrdftSolver(SWSolver):
         if self._opts.get(SW_OPT_REALCTYPE) == "float":
             print('opts.TRealCtype := "float";', file = script_file)
 
+        self._writeCodegenOpts(script_file)
         self._writePrintOpts(script_file)
 
         print('Add(opts.includes, "<float.h>");',  file = script_file)
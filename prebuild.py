@@ -0,0 +1,193 @@
+"""
+SnowWhite Prebuild Module
+=========================
+
+Build libraries for many solvers ahead of time, in parallel.
+
+A plan is a list of (problem, opts) pairs.  Each entry is built in its own
+worker process, with SPIRAL and compiler output going to a per-job log file.
+
+From the command line the plan is a JSON file holding a list of entries like
+    {"transform": "MDDFT", "dims": [64,64,64], "direction": "Inverse",
+     "opts": {"realctype": "float"}}
+
+usage: python -m snowwhite.prebuild plan.json [-j JOBS] [--logdir DIR]
+"""
+
+from snowwhite import *
+from snowwhite.batchmddftsolver import *
+from snowwhite.dftsolver import *
+from snowwhite.hockneysolver import *
+from snowwhite.mddftsolver import *
+from snowwhite.mdprdftsolver import *
+from snowwhite.mdrconvsolver import *
+from snowwhite.mdrfsconvsolver import *
+from snowwhite.prdftsolver import *
+
+import argparse
+import concurrent.futures
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import traceback
+
+# solver class for each problem class
+SW_SOLVER_FOR_PROBLEM = {
+    BatchMddftProblem   : BatchMddftSolver,
+    DftProblem          : DftSolver,
+    HockneyProblem      : HockneySolver,
+    MddftProblem        : MddftSolver,
+    MdprdftProblem      : MdprdftSolver,
+    MdrconvProblem      : MdrconvSolver,
+    MdrfsconvProblem    : MdrfsconvSolver,
+    PrdftProblem        : PrdftSolver,
+}
+
+
+def solverClassFor(problem):
+    """Return the solver class for a problem."""
+    cls = SW_SOLVER_FOR_PROBLEM.get(type(problem))
+    if cls == None:
+        raise TypeError('no solver for problem type ' + type(problem).__name__)
+    return cls
+
+
+def problemFromSpec(spec):
+    """Build (problem, opts) from a JSON plan entry."""
+    xform = spec.get('transform', '').upper()
+    dims = spec.get('dims', [])
+    k = SW_INVERSE if spec.get('direction', SW_STR_FORWARD) == SW_STR_INVERSE else SW_FORWARD
+    opts = dict(spec.get('opts', {}))
+    if xform == SW_TRANSFORM_DFT:
+        problem = DftProblem(dims[0], k)
+    elif xform == SW_TRANSFORM_BATDFT:
+        problem = DftProblem(dims[0], k, spec.get('batchDims', [1,1]),
+            spec.get('readStride', 1), spec.get('writeStride', 1))
+    elif xform == SW_TRANSFORM_MDDFT:
+        problem = MddftProblem(dims, k)
+    elif xform == SW_TRANSFORM_BATMDDFT:
+        problem = BatchMddftProblem(dims, spec.get('batch', 1), k)
+    elif xform == SW_TRANSFORM_MDPRDFT:
+        problem = MdprdftProblem(dims, k)
+    elif xform == SW_TRANSFORM_BATPRDFT:
+        problem = PrdftProblem(dims[0], k, spec.get('batchDims', [1,1]),
+            spec.get('readStride', 1), spec.get('writeStride', 1))
+    elif xform == SW_TRANSFORM_HOCKNEY:
+        problem = HockneyProblem(dims[0], spec.get('ns'), spec.get('nd'))
+    elif xform == SW_TRANSFORM_MDRCONV:
+        problem = MdrconvProblem(dims[0])
+    elif xform == SW_TRANSFORM_MDRFSCONV:
+        problem = MdrfsconvProblem(dims[0])
+    else:
+        raise ValueError('unknown transform: ' + str(spec.get('transform')))
+    return (problem, opts)
+
+
+def _failedResult(index, problem, dims, error, log=None):
+    """Result dict for an entry that could not be built."""
+    return {'index' : index, 'problem' : problem, 'dims' : dims, 'log' : log, 'ok' : False,
+            'error' : error, 'name' : None, 'seconds' : 0.0}
+
+
+def _buildOne(index, problem, opts, logfile):
+    """Construct one solver in a worker process, logging its output."""
+    result = {'index' : index, 'problem' : type(problem).__name__,
+              'dims' : problem.dimensions(), 'log' : logfile, 'ok' : False,
+              'error' : None, 'name' : None}
+    t0 = time.time()
+    with open(logfile, 'w') as log:
+        with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+            try:
+                solver = solverClassFor(problem)(problem, dict(opts))
+                result['name'] = solver._namebase
+                result['ok'] = True
+            except Exception as ex:
+                traceback.print_exc()
+                result['error'] = str(ex)
+    result['seconds'] = time.time() - t0
+    return result
+
+
+def prebuild(plan, jobs=None, logdir=None):
+    """Build libraries for a list of (problem, opts) pairs in parallel.
+
+    Arguments:
+    plan    -- list of (problem, opts) pairs
+    jobs    -- number of worker processes, default is the number of CPUs
+    logdir  -- directory for per-job logs, default is a new temp directory
+
+    Returns a list of result dicts in plan order.
+    """
+    if logdir == None:
+        logdir = tempfile.mkdtemp(prefix='sw_prebuild_')
+    os.makedirs(logdir, exist_ok=True)
+
+    results = [None] * len(plan)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = dict()
+        for (i, (problem, opts)) in enumerate(plan):
+            logfile = os.path.join(logdir, 'job{:04d}.log'.format(i))
+            futures[pool.submit(_buildOne, i, problem, opts, logfile)] = (i, problem, logfile)
+        for fut in concurrent.futures.as_completed(futures):
+            (i, problem, logfile) = futures[fut]
+            try:
+                results[i] = fut.result()
+            except Exception as ex:
+                # worker died or the job could not be sent to it
+                results[i] = _failedResult(i, type(problem).__name__, problem.dimensions(),
+                    type(ex).__name__ + ': ' + str(ex), logfile)
+    return results
+
+
+def prebuildSummary(results):
+    """Return a printable summary of prebuild results."""
+    failed = [r for r in results if not r['ok']]
+    total = sum([r['seconds'] for r in results])
+    lines = ['{} of {} built, {:.1f}s total build time'.format(
+        len(results) - len(failed), len(results), total)]
+    for r in failed:
+        lines.append('  FAILED {} {}: {} (log: {})'.format(
+            r['problem'], r['dims'], r['error'], r['log']))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m snowwhite.prebuild',
+        description='Build SnowWhite solver libraries ahead of time.')
+    parser.add_argument('plan', help='JSON file with list of plan entries')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+        help='number of parallel builds (default: number of CPUs)')
+    parser.add_argument('--logdir', default=None, help='directory for per-job logs')
+    args = parser.parse_args(argv)
+
+    with open(args.plan, 'r') as f:
+        specs = json.load(f)
+    if not type(specs) is list:
+        print(args.plan + ': plan must be a list of entries', file=sys.stderr)
+        return 1
+    
+    # bad entries are reported with the build failures, the rest are still built
+    plan = []
+    badEntries = []
+    for (i, spec) in enumerate(specs):
+        try:
+            plan.append((i, problemFromSpec(spec)))
+        except Exception as ex:
+            name = spec.get('transform') if type(spec) is dict else None
+            dims = spec.get('dims') if type(spec) is dict else None
+            badEntries.append(_failedResult(i, str(name), dims, 'bad plan entry: ' + type(ex).__name__ + ': ' + str(ex)))
+    built = prebuild([entry for (i, entry) in plan], args.jobs, args.logdir)
+    results = badEntries
+    for ((i, entry), res) in zip(plan, built):
+        res['index'] = i
+        results.append(res)
+    results.sort(key=lambda r: r['index'])
+    print(prebuildSummary(results))
+    return 0 if all([r['ok'] for r in results]) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,21 +2,34 @@
 import sys
 import subprocess
 import os
+import atexit
+import queue
+import shutil
+import threading
+import time
 
 
 SPIRAL_KEY_CMAKEVERSION     =  'CMakeVersion'
 SPIRAL_KEY_COMPILER         =  'Compiler'
 SPIRAL_KEY_CONFIGURATION    =  'Configuration'
 SPIRAL_KEY_DATETIMEUTC      =  'DateTimeUTC'
+SPIRAL_KEY_EXECUTABLE       =  'Executable'
+SPIRAL_KEY_EXEMTIME         =  'ExecutableMTime'
+SPIRAL_KEY_EXESIZE          =  'ExecutableSize'
 SPIRAL_KEY_GITBRANCH        =  'GitBranch'
 SPIRAL_KEY_GITHASH          =  'GitHash'
 SPIRAL_KEY_GITREMOTE        =  'GitRemote'
 SPIRAL_KEY_SYSTEM           =  'System'
 SPIRAL_KEY_VERSION          =  'Version'
 
+SPIRAL_ENV_SESSIONS =  'SW_SPIRAL_SESSIONS'
+SPIRAL_ENV_TIMEOUT  =  'SW_SPIRAL_TIMEOUT'
+
 SPIRAL_RET_OK   = 0
 SPIRAL_RET_ERR  = 1
 
+_spiralBuildInfoCache = None
+
 if sys.platform == 'win32':
     SPIRAL_EXE = 'spiral.bat'
 else:
@@ -24,11 +37,29 @@ else:
 
 
 def spiralBuildInfo():
+    # build info is fixed for the life of the process, so query SPIRAL only once
+    global _spiralBuildInfoCache
+    if _spiralBuildInfoCache == None:
+        info = _queryBuildInfo()
+        if len(info) == 0:
+            # SPIRAL without build info, identify it by its executable
+            info = _spiralStamp()
+        if len(info) == 0:
+            # SPIRAL not found, ask again next time
+            return dict()
+        _spiralBuildInfoCache = info
+    return dict(_spiralBuildInfoCache)
+
+
+def _queryBuildInfo():
     # -B option signals Spiral to print build info and exit early in startup
     # use BuildInfo() and quit commands for older Spiral version w/o -B option
     fallthroughstr = b'BuildInfo();\nquit;\n'
+    runprog = _spiralProgram()
+    if runprog == None:
+        return dict()
     try:
-        res = subprocess.run([SPIRAL_EXE, '-B'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, input=fallthroughstr)
+        res = subprocess.run([runprog, '-B'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, input=fallthroughstr)
     except:
         return dict()
     bdl = res.stdout.split(b'\n')
@@ -42,6 +73,22 @@ def spiralBuildInfo():
     return bdd
 
 
+def _spiralStamp():
+    """Path, size and modification time of the SPIRAL executable, empty if not found."""
+    runprog = _spiralProgram()
+    if runprog == None:
+        return dict()
+    path = shutil.which(runprog)
+    if path == None:
+        return dict()
+    path = os.path.realpath(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return dict()
+    return {SPIRAL_KEY_EXECUTABLE : path, SPIRAL_KEY_EXESIZE : st.st_size, SPIRAL_KEY_EXEMTIME : st.st_mtime_ns}
+
+
 def isSpiralInPath(progname):
     "Determine if the Spiral executable is in the user's PATH"
     try:
@@ -56,22 +103,27 @@ def isSpiralInPath(progname):
         return False
 
 
-def callSpiralWithFile(filename):
+def _spiralProgram():
+    """Return SPIRAL executable to run, or None if it can't be found."""
+    if isSpiralInPath(SPIRAL_EXE):
+        return SPIRAL_EXE
+    sh_value = os.environ.get ( 'SPIRAL_HOME' )
+    if sh_value is not None:
+        return os.path.join ( sh_value, 'bin', SPIRAL_EXE )
+    return None
+
+
+def callSpiralWithFile(filename, cwd=None):
+    """Run SPIRAL with filename as input, in directory cwd if given."""
     try:
-        if isSpiralInPath(SPIRAL_EXE):
-            runprog = SPIRAL_EXE
-        else:
-            ##  Try setting full path to Spiral exe as: $SPIRAL_HOME/bin/SPIRAL_EXE
-            sh_value = os.environ.get ( 'SPIRAL_HOME' )
-            if sh_value is not None:
-                runprog = os.path.join ( sh_value, 'bin', SPIRAL_EXE )
-                ##  print ( f'{SPIRAL_EXE} is NOT in the user\'s path, try running program {runprog}', flush=True )
-            else:
-                print ( f'Can\'t run {SPIRAL_EXE}, not found in PATH and SPIRAL_HOME is undefined', flush=True )
-                return SPIRAL_RET_ERR
+        ##  If not in PATH, try full path to Spiral exe as: $SPIRAL_HOME/bin/SPIRAL_EXE
+        runprog = _spiralProgram()
+        if runprog == None:
+            print ( f'Can\'t run {SPIRAL_EXE}, not found in PATH and SPIRAL_HOME is undefined', flush=True )
+            return SPIRAL_RET_ERR
 
         with open(filename, 'r') as f:
-            runResult = subprocess.run(runprog, stdin=f, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            runResult = subprocess.run(runprog, stdin=f, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd)
             if runResult.returncode == 0:
                 return SPIRAL_RET_OK
             else:
@@ -83,3 +135,235 @@ def callSpiralWithFile(filename):
         pass
     return SPIRAL_RET_ERR
 
+
+
+class SpiralPipeTransport:
+    """Long-lived SPIRAL process fed scripts over its stdin.
+    
+    A transport runs one script at a time with run(text), returning
+    (SPIRAL_RET_OK or SPIRAL_RET_ERR, output).  Each script is followed by
+    a Print of a numbered marker, and its output is everything SPIRAL
+    prints before the marker.  A script that takes longer than timeout
+    seconds kills the process.  Any object with run(), alive() and close()
+    can stand in for a transport, see SpiralStubTransport.
+    """
+    
+    _PRELUDE = 'Load(fftx);\nImportAll(fftx);\n'
+    
+    def __init__(self, progname=None, timeout=None):
+        if progname == None:
+            progname = _spiralProgram()
+        if progname == None:
+            raise RuntimeError(f'Can\'t run {SPIRAL_EXE}, not found in PATH and SPIRAL_HOME is undefined')
+        self._proc = subprocess.Popen(progname, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT, universal_newlines=True, bufsize=1)
+        self._timeout = timeout
+        self._count = 0
+        self._dead = False
+        # read output in a thread, so waiting for a script can time out
+        self._lines = queue.Queue()
+        reader = threading.Thread(target=self._readOutput, daemon=True)
+        reader.start()
+        # pay package loading once, up front
+        (ret, output) = self.run(self._PRELUDE)
+        if ret != SPIRAL_RET_OK:
+            self.close()
+            raise RuntimeError('SPIRAL session failed to start: ' + output)
+        
+    def _readOutput(self):
+        for line in self._proc.stdout:
+            self._lines.put(line)
+        # end of output, the process exited
+        self._lines.put(None)
+        
+    def alive(self):
+        # output can end before the exit status is available
+        return not self._dead and self._proc.poll() == None
+        
+    def run(self, text):
+        """Run script text, return (status, output)."""
+        self._count += 1
+        marker = '@@SW_DONE_' + str(self._count) + '@@'
+        try:
+            self._proc.stdin.write(text + '\nPrint("' + marker + '\\n");\n')
+            self._proc.stdin.flush()
+        except OSError:
+            self._dead = True
+            return (SPIRAL_RET_ERR, 'SPIRAL session exited')
+        deadline = None if self._timeout == None else time.monotonic() + self._timeout
+        lines = []
+        while True:
+            try:
+                wait = None if deadline == None else max(0.0, deadline - time.monotonic())
+                line = self._lines.get(timeout=wait)
+            except queue.Empty:
+                # the session is stuck in this script and can't be reused
+                self._proc.kill()
+                self._dead = True
+                lines.append('SPIRAL session timed out after ' + str(self._timeout) + ' seconds\n')
+                return (SPIRAL_RET_ERR, ''.join(lines))
+            if line == None:
+                # process exited before finishing the script
+                self._dead = True
+                lines.append('SPIRAL session exited\n')
+                return (SPIRAL_RET_ERR, ''.join(lines))
+            if marker in line:
+                # keep what precedes the marker, e.g. a break loop prompt
+                lines.append(line[:line.index(marker)])
+                break
+            lines.append(line)
+        output = ''.join(lines)
+        if 'brk>' in output or any([l.lstrip().startswith('Error') for l in lines]):
+            # leave the break loop so the session is ready for the next script
+            try:
+                self._proc.stdin.write('quit;\n')
+                self._proc.stdin.flush()
+            except OSError:
+                pass
+            return (SPIRAL_RET_ERR, output)
+        return (SPIRAL_RET_OK, output)
+        
+    def close(self):
+        try:
+            self._proc.stdin.close()
+            self._proc.wait(5)
+        except:
+            self._proc.kill()
+
+
+# stand-in for SPIRAL, see SpiralStubTransport
+_STUB_PROGRAM = r'''
+import re, sys, time
+prompt = ''
+for line in sys.stdin:
+    line = line.strip()
+    m = re.match(r'Print\("(.*)"\);$', line)
+    if m:
+        sys.stdout.write(prompt + m.group(1).replace('\\n', '\n'))
+    elif line.startswith('Error('):
+        m = re.match(r'Error\("(.*)"\);$', line)
+        sys.stdout.write('Error, ' + (m.group(1) if m else '') + '\n')
+        prompt = 'brk> '
+    elif line == 'quit;':
+        prompt = ''
+    elif line.startswith('Sleep('):
+        time.sleep(float(re.search(r'[0-9.]+', line).group(0)))
+    elif line.startswith('QUIT_GAP('):
+        sys.exit(int(re.search(r'[0-9]+', line).group(0)))
+    sys.stdout.flush()
+'''
+
+
+class SpiralStubTransport(SpiralPipeTransport):
+    """Pipe transport to a small Python program standing in for SPIRAL, for tests.
+    
+    The stub prints the strings of Print("..."); statements, so it follows
+    the same completion protocol as SPIRAL.  Error("msg"); prints an error
+    and enters a break loop until quit;, Sleep(secs); waits, and
+    QUIT_GAP(code); exits the process.  Other statements are ignored.
+    """
+    
+    def __init__(self, timeout=None):
+        super(SpiralStubTransport, self).__init__([sys.executable, '-c', _STUB_PROGRAM], timeout)
+
+
+class SpiralSessionPool:
+    """Pool of warm SPIRAL transports shared by builds in this process.
+    
+    Transports are made by calling transportFactory with no arguments.
+    A transport whose process has exited, e.g. after a crash or a
+    timeout, is replaced on the next run.
+    """
+    
+    def __init__(self, size=1, transportFactory=SpiralPipeTransport):
+        self._size = size
+        self._factory = transportFactory
+        self._idle = []
+        self._created = 0
+        # notified whenever a transport is returned or a dead one frees its slot
+        self._cond = threading.Condition()
+        
+    def _acquire(self):
+        with self._cond:
+            while len(self._idle) == 0 and self._created >= self._size:
+                self._cond.wait()
+            if len(self._idle) > 0:
+                return self._idle.pop()
+            self._created += 1
+        try:
+            return self._factory()
+        except:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+        
+    def _release(self, transport):
+        alive = transport.alive()
+        if not alive:
+            # replaced by the next acquire, which may be waiting now
+            transport.close()
+        with self._cond:
+            if alive:
+                self._idle.append(transport)
+            else:
+                self._created -= 1
+            self._cond.notify()
+            
+    def runScript(self, text):
+        """Run script text on a warm transport, return (status, output)."""
+        transport = self._acquire()
+        try:
+            return transport.run(text)
+        finally:
+            self._release(transport)
+            
+    def close(self):
+        with self._cond:
+            idle = self._idle
+            self._idle = []
+            self._created -= len(idle)
+        for transport in idle:
+            transport.close()
+
+
+_sessionPool = None
+
+
+def spiralSessionPool():
+    """Return process-wide session pool, or None if sessions are not enabled.
+    
+    Sessions are enabled by setSpiralSessionPool() or by setting the
+    SW_SPIRAL_SESSIONS environment variable to the pool size.  If
+    SW_SPIRAL_TIMEOUT is set, a script running longer than that many
+    seconds fails and its session is restarted.
+    """
+    global _sessionPool
+    if _sessionPool == None:
+        try:
+            size = int(os.getenv(SPIRAL_ENV_SESSIONS, '0'))
+        except ValueError:
+            size = 0
+        try:
+            timeout = float(os.getenv(SPIRAL_ENV_TIMEOUT, '0'))
+        except ValueError:
+            timeout = 0
+        timeout = timeout if timeout > 0 else None
+        if size > 0:
+            _sessionPool = SpiralSessionPool(size, lambda: SpiralPipeTransport(timeout=timeout))
+            atexit.register(_sessionPool.close)
+    return _sessionPool
+
+
+def setSpiralSessionPool(pool):
+    """Use pool for SPIRAL runs in this process, None returns to one process per script."""
+    global _sessionPool
+    _sessionPool = pool
+
+
+def callSpiralWithSession(text):
+    """Run script text on the session pool."""
+    (ret, output) = spiralSessionPool().runScript(text)
+    if ret != SPIRAL_RET_OK:
+        print(output, file=sys.stderr)
+    return ret
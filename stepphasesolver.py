@@ -67,13 +67,18 @@ class StepPhaseSolver(SWSolver):
     def solve(self, src, amplitudes, dst=None):
         """Call SPIRAL-generated function."""
         
-        xp = get_array_module(src)
+        if not self.ready():
+            return self._solveDef(dst, src, amplitudes)
         
         if type(dst) == type(None):
-            n = self._problem.dimN()  
-            dst = xp.zeros((n, n, n), src.dtype)
+            dst = self._newDst(src)
         self._func(dst, src, amplitudes)
         return dst
+        
+    def _newDst(self, src):
+        xp = get_array_module(src)
+        n = self._problem.dimN()  
+        return self._newArray(xp, (n, n, n), src.dtype)
                     
     def _func(self, dst, src, amplitudes):
         """Call the SPIRAL generated main function"""
@@ -98,7 +103,7 @@ class StepPhaseSolver(SWSolver):
                     ctypes.cast(amplitudes.data.ptr, ctypes.POINTER(ctypes.c_void_p)))
 
     def _writeScript(self, script_file):
-        filename = self._namebase
+        filename = self._outputBase()
         nameroot = self._namebase
         ns = str(self._problem.dimN())
         filetype = '.c'
@@ -131,6 +136,7 @@ class StepPhaseSolver(SWSolver):
             print ( 'opts.wrapCFuncs := true;', file = script_file )
         if self._opts.get(SW_OPT_REALCTYPE) == "float":
             print('opts.TRealCtype := "float";', file = script_file)
+        self._writeCodegenOpts(script_file)
         print('Add(opts.includes, "<float.h>");',  file = script_file)
         print('tt := opts.tagIt(t);', file = script_file)
         print('', file = script_file)
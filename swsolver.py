@@ -2,12 +2,23 @@
 from snowwhite import *
 import snowwhite as sw
 from snowwhite.metadata import *
+from snowwhite.libcache import *
+from snowwhite.compiler import *
+from snowwhite.libhandles import *
+from snowwhite.bufpool import *
+from snowwhite.autotune import lookupWisdom
 
+import concurrent.futures
+import contextlib
 import datetime
+import hashlib
+import io
+import time
 import subprocess
 import os
 import sys
 import json
+import re
 
 import tempfile
 import shutil
@@ -20,8 +31,24 @@ except ModuleNotFoundError:
     cp = None
 
 import ctypes
-import sys
+import threading
+
+
+# SPIRAL vector ISA for each SIMD option, for double and single precision
+_SIMD_SPIRAL_ISA = {
+    SW_SIMD_SSE2    : ('SSE_2x64f', 'SSE_4x32f'),
+    SW_SIMD_AVX     : ('AVX_4x64f', 'AVX_8x32f'),
+    SW_SIMD_AVX2    : ('AVX_4x64f', 'AVX_8x32f'),
+    SW_SIMD_AVX512  : ('AVX512_8x64f', 'AVX512_16x32f'),
+}
 
+# prefix of the intrinsics vectorized code uses for each SIMD option
+_SIMD_INTRINSICS = {
+    SW_SIMD_SSE2    : '_mm_',
+    SW_SIMD_AVX     : '_mm256_',
+    SW_SIMD_AVX2    : '_mm256_',
+    SW_SIMD_AVX512  : '_mm512_',
+}
 
 
 class SWProblem:
@@ -41,10 +68,118 @@ class SWProblem:
         return self._k
         
 
+# source digests of solver classes, by class
+_sourceDigests = dict()
+_sourceDigestsLock = threading.Lock()
+
+
+def _classSourceDigest(cls):
+    """Digest of the source of the modules defining cls and its base classes."""
+    with _sourceDigestsLock:
+        digest = _sourceDigests.get(cls)
+        if digest == None:
+            h = hashlib.sha256()
+            for c in cls.__mro__:
+                path = getattr(sys.modules.get(c.__module__), '__file__', None)
+                if path != None:
+                    with open(path, 'rb') as f:
+                        h.update(f.read())
+            digest = h.hexdigest()[:16]
+            _sourceDigests[cls] = digest
+        return digest
+
+
+def _functionBodies(code):
+    """(name, body) of each function defined in C code, by brace matching."""
+    bodies = []
+    (depth, start, header) = (0, 0, 0)
+    for m in re.finditer(r'[{};]', code):
+        c = m.group()
+        if c == '{':
+            if depth == 0:
+                start = m.end()
+            depth += 1
+        elif c == '}' and depth > 0:
+            depth -= 1
+            if depth == 0:
+                # a function if its header ends with a parameter list, not an initializer
+                head = code[header:start - 1].rstrip()
+                name = re.search(r'(\w+)\s*\(', head)
+                if head.endswith(')') and name != None:
+                    bodies.append((name.group(1), code[start:m.start()]))
+                header = m.end()
+        elif depth == 0:
+            header = m.end()
+    return bodies
+
+
+def _writesVariable(code, name):
+    """True if C code assigns to, increments, or copies into variable name."""
+    name = re.escape(name)
+    pattern = (r'\b' + name + r'\s*(\[[^;]*?\]\s*)?((<<|>>|[-+*/%&|^])?=(?!=)|\+\+|--)' +
+               r'|(\+\+|--)\s*' + name + r'\b' +
+               r'|\bmem(cpy|move|set)\s*\(\s*&?\s*' + name + r'\b')
+    return re.search(pattern, code) != None
+
+
+def _dataPtr(a):
+    """Address of array data, NumPy or CuPy."""
+    if sw.get_array_module(a) == np:
+        return a.ctypes.data
+    return a.data.ptr
+
+
+class SWPlan:
+    """Solver call bound to fixed buffers, returned by SWSolver.bind()."""
+    
+    def __init__(self, solver, src, params, dst):
+        if not solver.waitReady():
+            raise RuntimeError('library for ' + solver._namebase + ' is not ready')
+        dst = solver._inplaceDst(src, dst)
+        if type(dst) == type(None):
+            dst = solver._newDst(src)
+        for a in [dst, src] + list(params):
+            solver._checkBuffer(a)
+        self._solver = solver
+        self._src = src
+        self._params = params
+        self._dst = dst
+        self._result = solver._resultView(dst)
+        # keep arrays made for the call, e.g. sliced symbols, alive with the plan
+        self._args = solver._nativeArgs(dst, src, *params)
+        self._ptrs = tuple([_dataPtr(a) for a in self._args])
+        self._func = solver._wrapNative(solver._boundFunc(len(self._args)))
+        self._update = None
+        if type(solver)._updateNativeArgs is not SWSolver._updateNativeArgs:
+            self._update = solver._updateNativeArgs
+        self._post = None
+        if type(solver)._postProcess is not SWSolver._postProcess:
+            self._post = solver._postProcess
+            
+    def src(self):
+        return self._src
+        
+    def dst(self):
+        """The result array, as solve() returns it."""
+        return self._result
+        
+    def execute(self):
+        """Run the transform on the bound buffers, return dst()."""
+        if self._update != None:
+            self._update(self._args, self._dst, self._src, *self._params)
+        self._func(*self._ptrs)
+        if self._post != None:
+            self._post(self._dst)
+        return self._result
+
+
 class SWSolver:
     """Base class for SnowWhite solver."""
     
     def __init__(self, problem: SWProblem, namebase = 'func', opts = {}):
+        self._startTime = time.perf_counter()
+        self._buildStats = dict()
+        self._libSource = None
         self._problem = problem
         self._opts = opts
         self._colMajor = self._opts.get(SW_OPT_COLMAJOR, False)
@@ -55,20 +190,65 @@ class SWSolver:
         self._printICode = self._opts.get(SW_OPT_PRINTICODE, os.getenv(SW_PRINTICODE) != None)
         self._printRuleTree = self._opts.get(SW_OPT_PRINTRULETREE, os.getenv(SW_PRINTRULETREE) != None)
         self._printSums = self._opts.get(SW_OPT_PRINTSUMS, os.getenv(SW_PRINTSUMS) != None)
+        self._traceState = threading.local()
         self._tracingOn = False
+        self._traced = False
         self._callGraph = []
         self._SharedLibAccess = None
+        self._handleKey = None
         self._MainFunc = None
+        self._boundFuncs = dict()
+        self._bufferPool = self._opts.get(SW_OPT_BUFFERPOOL)
+        self._fuseScale = self._opts.get(SW_OPT_FUSESCALE, False)
+        self._inplace = self._opts.get(SW_OPT_INPLACE, False)
+        self._reentrant = self._opts.get(SW_OPT_REENTRANT, False)
+        if self._reentrant and (self._genCuda or self._genHIP):
+            raise ValueError('reentrant option is only supported for CPU code')
+        self._callLock = None
+        self._coalescer = None
+        if self._inplace and not self._supportsInplace():
+            raise ValueError(type(self).__name__ + ' does not support in-place transforms for this problem')
+        self._status = SW_STATUS_BUILDING
+        self._buildError = None
+        self._buildThread = None
+        self._asyncBuild = self._opts.get(SW_OPT_ASYNCBUILD, False)
         self._spiralname = 'spiral'
         self._metadata = dict()
         self._includeMetadata = self._opts.get(SW_OPT_METADATA, False)
         self._workdir = os.getenv(SW_WORKDIR)
+        self._scriptOutDir = None
+        self._builder = self._opts.get(SW_OPT_BUILDER, os.getenv(SW_BUILDER, SW_BUILDER_CMAKE))
+        self._buildLog = self._opts.get(SW_OPT_BUILDLOG, os.getenv(SW_BUILDLOG))
+        self._compileProfile = normalizeProfile(self._opts.get(SW_OPT_COMPILEPROFILE))
+        self._requestedProfile = self._compileProfile
+        
+        # threaded CPU code is generated for a fixed number of OpenMP threads
+        self._threads = int(self._opts.get(SW_OPT_THREADS, 1))
+        if self._genCuda or self._genHIP:
+            self._threads = 1
+        self._threadCount = [self._threads]
+        if self._reentrant and self._threads > 1:
+            # per-thread temporaries can't be shared by an OpenMP team
+            raise ValueError('reentrant option is only supported for single-threaded code')
+        if self._threads > 1:
+            self._compileProfile = normalizeProfile(self._compileProfile + '+' + SW_PROFILE_OPENMP)
+        # -march=native code only runs on hosts with the same target
+        self._nativeTarget = None
+        if SW_PROFILE_NATIVE in self._compileProfile.split('+') and not (self._genCuda or self._genHIP):
+            self._nativeTarget = nativeTarget()
+        
+        # SIMD instruction set for CPU code, 'auto' tries host instruction sets best first
+        simdChoices = self._simdChoices(self._opts.get(SW_OPT_SIMD))
+        self._simd = simdChoices[0]
+        self._rules = []
         
         # find and possibly create the .libs subdirectory
         moduleDir = os.path.dirname(os.path.realpath(__file__))
         self._libsDir = os.path.join(moduleDir, SW_LIBSDIR)
         os.makedirs(self._libsDir, mode=0o777, exist_ok=True)
         
+        if self._inplace:
+            namebase = namebase + '_ip'
         if self._genCuda:
             self._namebase = namebase + '_cu'
         elif self._genHIP:
@@ -80,38 +260,534 @@ class SWSolver:
         self._initFuncName = 'init_' + self._namebase
         self._destroyFuncName = 'destroy_' + self._namebase
         
-        # check first for library built for this specific transform
-        sharedLibFullPath = os.path.join(self._libsDir, 'lib' + self._namebase + SW_SHLIB_EXT)
+        variants = self._variants(simdChoices)
+        self._useVariant(variants[0])
+        
+        # script only, used when building multi-transform libraries
+        if self._opts.get(SW_OPT_SCRIPTONLY, False):
+            return
+        
+        # use the best SIMD variant that is already built, else build the best one,
+        # unless there is autotuning to do first
+        sharedLibFullPath = None
+        tune = self._needsTuning()
+        for variant in ([] if tune else variants):
+            self._useVariant(variant)
+            sharedLibFullPath = self._findLibrary()
+            if sharedLibFullPath != None:
+                break
+        if sharedLibFullPath == None:
+            self._useVariant(variants[0])
+            self._libSource = 'build'
+            if self._asyncBuild:
+                # build in background, solve() uses runDef() until library is loaded
+                self._buildThread = threading.Thread(target=self._buildAsync, daemon=True)
+                self._buildThread.start()
+                return
+            sharedLibFullPath = self._setupLibrary()
 
-        # if no matching specific library, look in metadata of installed libraries
-        # and create one if no matching transform is in an existing installed library
-        if not os.path.exists(sharedLibFullPath):
-            searchmd = self._metadataForSearch()
-            (path, names) = findFunctionsWithMetadata(searchmd)
-            if (type(path) is str) and (type(names) is dict) and (len(names) > 2):
-                sharedLibFullPath = path
-                self._mainFuncName    = names.get(SW_KEY_EXEC, self._mainFuncName)
-                self._initFuncName    = names.get(SW_KEY_INIT, self._initFuncName)
-                self._destroyFuncName = names.get(SW_KEY_DESTROY, self._destroyFuncName)
-            else:
-                self._setupCFuncs(self._namebase)
+        self._loadLibrary(sharedLibFullPath)
+        self._logBuildStats()
 
-        self._SharedLibAccess = ctypes.CDLL(sharedLibFullPath)
-        self._MainFunc = getattr(self._SharedLibAccess, self._mainFuncName)
-        if self._MainFunc == None:
-            msg = 'could not find function: ' + self._mainFuncName
-            raise RuntimeError(msg)
-        self._initFunc()
+    def _prepareScript(self):
+        """Choose SPIRAL rules and compute the library cache key for the current SIMD choice."""
+        self._useVariant(self._variants([self._simd])[0])
+        
+    def _useVariant(self, variant):
+        """Select a build variant returned by _variants()."""
+        (self._simd, self._rules, self._cacheKey, self._wisdomSearch) = variant
+        
+    def _variants(self, simdChoices):
+        """SIMD choice, SPIRAL rules, library cache key and wisdom search metadata of each build variant.
+        
+        Wisdom is looked up and recorded under the search metadata of the
+        requested options, taken here before building, since the build may
+        drop variants SPIRAL generated no code for.
+        
+        The script is rendered once, without the SIMD tag and rules, which
+        go into the key through the build options and the rule statements.
+        """
+        (simd, rules) = (self._simd, self._rules)
+        (self._simd, self._rules) = (None, [])
+        try:
+            text = self._keyScriptText()
+        finally:
+            (self._simd, self._rules) = (simd, rules)
+        with self._timed('buildinfo'):
+            buildinfo = spiralBuildInfo()
+        variants = []
+        for choice in simdChoices:
+            self._simd = choice
+            searchmd = self._metadataForSearch()
+            # SPIRAL rule choices, from opts or from wisdom for this variant
+            rules = self._opts.get(SW_OPT_RULES)
+            if rules == None:
+                entry = lookupWisdom(searchmd)
+                rules = entry.get('rules', []) if entry != None else []
+            buildopts = dict(self._opts)
+            buildopts[SW_OPT_SIMD] = choice
+            if self._nativeTarget != None:
+                buildopts[SW_KEY_NATIVETARGET] = self._nativeTarget
+            variants.append((choice, rules, cacheKey(text + '\n'.join(rules), buildopts, buildinfo), searchmd))
+        self._simd = simd
+        return variants
+        
+    def _findLibrary(self):
+        """Return path of existing library for this solver, or None."""
+        # check first for library built from this exact script and options
+        with self._timed('cache_lookup'):
+            path = findCachedLibrary(self._namebase, self._cacheKey, cacheDirs(self._libsDir))
+        if path != None:
+            self._libSource = 'cache'
+            return path
 
+        # then look in metadata of installed libraries, skipping other cache
+        # entries since they were built from a different script
+        searchmd = self._metadataForSearch()
+        with self._timed('metadata_lookup'):
+            (path, names) = findFunctionsWithMetadata(searchmd, skipfile=isCachedLibrary)
+        if (type(path) is str) and (type(names) is dict) and (len(names) > 2):
+            self._libSource = 'metadata'
+            self._mainFuncName    = names.get(SW_KEY_EXEC, self._mainFuncName)
+            self._initFuncName    = names.get(SW_KEY_INIT, self._initFuncName)
+            self._destroyFuncName = names.get(SW_KEY_DESTROY, self._destroyFuncName)
+            return path
+        return None
+        
+    def _simdChoices(self, simd):
+        """SIMD instruction sets to look for, best first, None for scalar code."""
+        if simd == None or self._genCuda or self._genHIP:
+            return [None]
+        if simd == SW_SIMD_AUTO:
+            return hostSIMD() + [None]
+        if simd not in SW_SIMD_FLAGS:
+            raise ValueError('unknown SIMD instruction set: ' + str(simd))
+        return [simd]
+        
     def __del__(self):
         try:
             # destroy function may not exist if cleaning up after error
-            self._destroyFunc()
+            self._releaseLibrary()
         except:
             pass
     
+    @property
+    def _tracingOn(self):
+        """True while this thread traces runDef().
+        
+        The flag is per thread, so runDef() serving solve() on other threads
+        during a background build does not add to the call graph.
+        """
+        return getattr(self._traceState, 'on', False)
+        
+    @_tracingOn.setter
+    def _tracingOn(self, on):
+        self._traceState.on = on
+        
     def solve(self):
         raise NotImplementedError()
+        
+    def solve_many(self, srcs, *params, dsts=None, workers=None, timings=None):
+        """Solve independent inputs on a thread pool, return outputs in order.
+        
+        Arguments:
+        srcs    -- list of inputs
+        params  -- further solve() arguments, the same for every input
+        dsts    -- list of outputs, or array indexed by input, default preallocated,
+                   from the buffer pool if there is one
+        workers -- number of threads, default os.cpu_count()
+        timings -- if a list, per-input solve() times in seconds are appended in order
+        
+        ctypes releases the GIL during native calls, so reentrant solvers
+        run the transforms in parallel; others run one native call at a time.
+        """
+        srcs = list(srcs)
+        if type(dsts) == type(None):
+            if self._inplace or not self.ready():
+                dsts = [None] * len(srcs)
+            else:
+                dsts = [self._newDst(src) for src in srcs]
+        if len(dsts) != len(srcs):
+            raise ValueError('dsts must have one output for each input')
+        times = [0.0] * len(srcs)
+        
+        def solveOne(i):
+            t0 = time.perf_counter()
+            out = self.solve(srcs[i], *params, dst=dsts[i])
+            times[i] = time.perf_counter() - t0
+            return out
+            
+        if workers == 1 or len(srcs) < 2:
+            results = [solveOne(i) for i in range(len(srcs))]
+        else:
+            if workers == None:
+                workers = os.cpu_count() or 1
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(solveOne, range(len(srcs))))
+        if type(timings) == list:
+            timings.extend(times)
+        return results
+        
+    async def submit(self, src):
+        """Solve src batched with other concurrent submits, for asyncio callers.
+        
+        Inputs submitted within the maxwait option's seconds (default 1 ms),
+        up to the maxbatch option (default 64), run as one call to a batched
+        library, see snowwhite.coalesce.  DftSolver and MddftSolver only.
+        """
+        if self._coalescer == None:
+            from snowwhite.coalesce import SWCoalescer, SW_MAXBATCH, SW_MAXWAIT
+            self._coalescer = SWCoalescer(self, self._opts.get(SW_OPT_MAXBATCH, SW_MAXBATCH),
+                                          self._opts.get(SW_OPT_MAXWAIT, SW_MAXWAIT))
+        return await self._coalescer.submit(src)
+        
+    def bind(self, src, *params, dst=None):
+        """Return an SWPlan calling the native function on these buffers.
+        
+        Arguments are those of solve().  The buffers are checked and their
+        addresses taken once, so plan.execute() is one native call plus any
+        normalization.  Arrays the native call needs derived from the
+        arguments, e.g. the half cube of a full-cube convolution symbol, are
+        refreshed from them on each execute(), so later changes to the bound
+        arrays are seen.  Waits for a background build to finish.
+        """
+        return SWPlan(self, src, params, dst)
+        
+    def _newDst(self, src):
+        """Allocate output array for src."""
+        raise NotImplementedError()
+        
+    def _postProcess(self, dst):
+        """Finish output after the native call, e.g. normalize."""
+        pass
+        
+    def _resultView(self, dst):
+        """Array solve() returns for dst written by the native function."""
+        return dst
+        
+    def _updateNativeArgs(self, args, dst, src, *params):
+        """Refresh arrays in args that _nativeArgs() derived from the arguments, before a bound call."""
+        pass
+        
+    def _normalized(self):
+        """True if the generated function applies the normalization itself."""
+        return False
+        
+    def _supportsInplace(self):
+        """True if the solver can generate an in-place transform for its problem."""
+        return False
+        
+    def _inplaceSpec(self, spec):
+        """SPIRAL transform spec, marked in-place if the inplace option is set."""
+        if self._inplace:
+            return 'Inplace(' + spec + ')'
+        return spec
+        
+    def _inplaceDst(self, src, dst):
+        """Output array for the native call, src itself for in-place solvers."""
+        if self._inplace:
+            if type(dst) != type(None) and dst is not src:
+                raise ValueError('in-place solver writes its result to src, dst must be None or src')
+            if not (src.flags.c_contiguous or src.flags.f_contiguous):
+                raise ValueError('in-place transform needs a contiguous array')
+            return src
+        if dst is src:
+            raise ValueError('dst is src, the solver must be created with the inplace option')
+        return dst
+        
+    def _newArray(self, xp, shape, dtype, order='C', zero=True):
+        """Array for the native function to write, from the buffer pool if there is one."""
+        pool = self._bufferPool if self._bufferPool != None else currentBufferPool()
+        if pool != None and xp == np:
+            # kernels write every element, so pooled arrays are not zero-filled
+            return pool.empty(shape, dtype, order)
+        if not zero:
+            return xp.empty(shape, dtype, order=order)
+        return xp.zeros(shape, dtype, order=order)
+        
+    def _nativeArgs(self, dst, src, *params):
+        """Arrays passed to the native function, in order."""
+        return [dst, src] + list(params)
+        
+    def _checkBuffer(self, a):
+        """Raise if array cannot be passed to the native function."""
+        xp = sw.get_array_module(a)
+        if xp == np and (self._genCuda or self._genHIP):
+            raise RuntimeError('GPU function requires CuPy arrays')
+        if xp != np and not (self._genCuda or self._genHIP):
+            raise RuntimeError('CPU function requires NumPy arrays')
+        if not (a.flags.c_contiguous or a.flags.f_contiguous):
+            raise ValueError('arrays passed to native function must be contiguous')
+            
+    def _boundFunc(self, nargs):
+        """Main function with a prototype of nargs pointers and no result."""
+        func = self._boundFuncs.get(nargs)
+        if func == None:
+            proto = ctypes.CFUNCTYPE(None, *([ctypes.c_void_p] * nargs))
+            func = proto((self._mainFuncName, self._SharedLibAccess))
+            self._boundFuncs[nargs] = func
+        return func
+
+    def build_stats(self):
+        """Timings of solver construction phases.
+        
+        Returns dict with the library path, where it came from ('cache',
+        'metadata', or 'build'), the cache key, the total construction time
+        in seconds, and a dict of seconds per phase.  Phases are 'trace',
+        'script', 'buildinfo', 'autotune', 'cache_lookup', 'metadata_lookup', 'lock_wait',
+        'spiral', 'cmake_configure', 'cmake_build', 'cmake_install', 'compile',
+        'publish', 'dlopen', and 'init', each present only if it ran.
+        """
+        lib = self._SharedLibAccess
+        return {
+            'solver'   : type(self).__name__,
+            'name'     : self._namebase,
+            'cachekey' : getattr(self, '_cacheKey', None),
+            'source'   : self._libSource,
+            'library'  : lib._name if lib != None else None,
+            'status'   : self._status,
+            'total'    : self._buildStats.get('total'),
+            'phases'   : {k:v for k,v in self._buildStats.items() if k != 'total'}
+        }
+        
+    @contextlib.contextmanager
+    def _timed(self, phase):
+        """Add time spent in block to phase in build stats."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._buildStats[phase] = self._buildStats.get(phase, 0.0) + time.perf_counter() - t0
+            
+    def _logBuildStats(self):
+        """Record total construction time and append stats to build log if set."""
+        self._buildStats['total'] = time.perf_counter() - self._startTime
+        if self._buildLog == None:
+            return
+        rec = self.build_stats()
+        rec['time'] = datetime.datetime.now().isoformat()
+        rec['pid'] = os.getpid()
+        try:
+            with open(self._buildLog, 'a') as f:
+                f.write(json.dumps(rec, default=str) + '\n')
+        except OSError as ex:
+            print('Could not write build log ' + str(self._buildLog) + ': ' + ex.strerror, file=sys.stderr)
+
+    def reentrant(self):
+        """True if threads may call solve() concurrently without serializing native calls."""
+        return self._reentrant
+        
+    def threads(self):
+        """Number of threads the library was generated for, 1 for serial code.
+        
+        This is the threads option until the library is loaded, then what
+        it was actually built with, 1 if SPIRAL generated no OpenMP code.
+        """
+        return self._threads
+        
+    def setThreads(self, n):
+        """Set OpenMP thread count this solver's calls use, up to threads().
+        
+        The count applies to this solver only: it is set for the calling
+        thread just before each native call, including calls of existing
+        plans, and the thread's previous count is restored after.
+        """
+        if self._threads < 2:
+            return
+        if n < 1 or n > self._threads:
+            raise ValueError('thread count must be between 1 and ' + str(self._threads))
+        if self._SharedLibAccess != None and getattr(self._SharedLibAccess, 'omp_set_num_threads', None) == None:
+            msg = 'could not find function: omp_set_num_threads'
+            raise RuntimeError(msg)
+        self._threadCount[0] = n
+        
+    def status(self):
+        """Status of native library, SW_STATUS_BUILDING, SW_STATUS_READY, or SW_STATUS_FAILED."""
+        return self._status
+        
+    def ready(self):
+        """True once the native library is loaded and solve() calls it."""
+        return self._status == SW_STATUS_READY
+        
+    def buildError(self):
+        """Exception raised by a failed background build, or None."""
+        return self._buildError
+        
+    def waitReady(self, timeout=None):
+        """Wait for a background build to finish, return True if library is ready."""
+        if self._buildThread != None:
+            self._buildThread.join(timeout)
+        return self.ready()
+        
+    def _loadLibrary(self, path):
+        """Load library and take a reference to the transform, then switch solve() to the native function.
+        
+        The library and its init call are shared by all solvers for the transform in the process.
+        """
+        with self._timed('dlopen'):
+            self._SharedLibAccess = loadLibrary(path)
+        mainFunc = getattr(self._SharedLibAccess, self._mainFuncName, None)
+        if mainFunc == None:
+            msg = 'could not find function: ' + self._mainFuncName
+            raise RuntimeError(msg)
+        with self._timed('init'):
+            self._handleKey = acquireTransform(path, self._initFuncName, self._destroyFuncName)
+        recordLibraryUse(path)
+        self._verifyLibrary(path)
+        if not self._reentrant:
+            # temporaries are global, one call to the transform at a time
+            self._callLock = transformLock(self._handleKey)
+        self._MainFunc = self._wrapNative(mainFunc)
+        self._status = SW_STATUS_READY
+        
+    def _wrapNative(self, func):
+        """Native function with this solver's OpenMP thread count and call serialization."""
+        if self._threads > 1 and getattr(self._SharedLibAccess, 'omp_set_num_threads', None) != None:
+            func = ThreadCountFunction(func, self._SharedLibAccess, self._threadCount)
+        if self._callLock != None:
+            func = SerializedFunction(func, self._callLock)
+        return func
+        
+    def _libraryFunctionMetadata(self, path):
+        """Metadata of this solver's function in library, None if the library has none."""
+        try:
+            metaobj = metadataInFile(path)
+        except (OSError, ValueError):
+            return None
+        if not type(metaobj) is dict:
+            return None
+        for funcmeta in metaobj.get(SW_KEY_TRANSFORMS, []):
+            if funcmeta.get(SW_KEY_NAMES, dict()).get(SW_KEY_EXEC) == self._mainFuncName:
+                return funcmeta
+        return None
+        
+    def _verifyLibrary(self, path):
+        """Match build variants to what the library was built with, from its metadata or symbols.
+        
+        A library found in the cache may have been built from code SPIRAL
+        did not parallelize or vectorize, or that keeps global state, see
+        _checkGenerated() and _checkReentrant().  Without metadata, a
+        library is only called concurrently if it defines no writable
+        variables.
+        """
+        if self._threads < 2 and self._simd == None and not self._reentrant:
+            return
+        funcmeta = self._libraryFunctionMetadata(path)
+        if funcmeta != None:
+            self._threads = int(funcmeta.get(SW_KEY_THREADS, 1))
+            self._simd = funcmeta.get(SW_KEY_SIMD)
+            self._reentrant = funcmeta.get(SW_KEY_REENTRANT, False)
+        else:
+            if self._threads > 1 and libraryUsesOpenMP(path) == False:
+                self._threads = 1
+            if self._reentrant and self._globalState(path) != []:
+                self._reentrant = False
+        self._threadCount[0] = min(self._threadCount[0], self._threads)
+        
+    def _generatedCode(self, builddir):
+        """Text of the CPU source SPIRAL generated in builddir, None if there is none."""
+        if self._genCuda or self._genHIP:
+            return None
+        try:
+            with open(os.path.join(builddir, self._namebase + '.c'), 'r') as f:
+                return f.read()
+        except OSError:
+            return None
+            
+    def _globalState(self, libpath, code=None):
+        """Writable variables of the transform in library, None if they can't be listed.
+        
+        With the generated code, only variables its functions other than
+        init and destroy write count, so tables filled once by init, and
+        other transforms in a multi-transform library, are not blamed.
+        """
+        names = writableSymbols(libpath)
+        if names == None or code == None:
+            return names
+        calls = [body for (fname, body) in _functionBodies(code)
+                 if fname not in (self._initFuncName, self._destroyFuncName)]
+        return [name for name in names if any(_writesVariable(body, name.split('.')[0]) for body in calls)]
+        
+    def _checkReentrant(self, libpath, builddir):
+        """Clear the reentrant option if the built transform keeps global state, return it.
+        
+        SPIRAL may still place some temporaries or constants in writable
+        globals, which concurrent calls would share.
+        """
+        if not self._reentrant:
+            return False
+        names = self._globalState(libpath, self._generatedCode(builddir))
+        if names != []:
+            found = 'cannot list its symbols' if names == None else 'has global state ' + ', '.join(names[:5])
+            print(self._namebase + ' ' + found + ', serializing calls to it', file=sys.stderr)
+            self._reentrant = False
+        return self._reentrant
+        
+    def _checkGenerated(self, builddir, adjustFlags=True):
+        """Drop build variants SPIRAL generated no code for, before metadata is written.
+        
+        If adjustFlags, compile flags only the dropped variants needed are
+        dropped too.  Multi-transform libraries keep the flags they share,
+        so their transforms keep the SIMD instruction set they need.
+        """
+        code = self._generatedCode(builddir)
+        if code == None:
+            return
+        if self._threads > 1 and '#pragma omp' not in code:
+            print('SPIRAL generated no OpenMP code for ' + self._namebase + ', building it serial', file=sys.stderr)
+            self._threads = 1
+            self._threadCount[0] = 1
+            if adjustFlags:
+                self._compileProfile = self._requestedProfile
+        if self._simd != None and _SIMD_INTRINSICS[self._simd] not in code:
+            if adjustFlags:
+                print('SPIRAL generated no ' + self._simd + ' code for ' + self._namebase + ', building it scalar', file=sys.stderr)
+                self._simd = None
+            else:
+                # still compiled for the instruction set, which the metadata records
+                print('SPIRAL generated no ' + self._simd + ' code for ' + self._namebase, file=sys.stderr)
+        
+    def _releaseLibrary(self):
+        """Drop this solver's reference to the transform, the last one calls destroy."""
+        key = self._handleKey
+        self._handleKey = None
+        if key != None:
+            releaseTransform(key)
+        
+    def _setupLibrary(self):
+        """Autotune if still needed, then find or build the library, return its path."""
+        if self._needsTuning():
+            from snowwhite.autotune import autotune
+            with self._timed('autotune'):
+                autotune(self._problem, self._opts)
+            # the winning candidate was built while tuning
+            self._prepareScript()
+            path = self._findLibrary()
+            if path != None:
+                return path
+            self._libSource = 'build'
+        return self._setupCFuncs(self._namebase)
+        
+    def _buildAsync(self):
+        """Tune, build and load library, run in background thread."""
+        try:
+            path = self._setupLibrary()
+            self._loadLibrary(path)
+            self._logBuildStats()
+        except Exception as ex:
+            print('Background build of ' + self._namebase + ' failed: ' + str(ex), file=sys.stderr)
+            self._buildError = ex
+            self._status = SW_STATUS_FAILED
+            
+    def _solveDef(self, dst, *args, scale=1):
+        """Solve with runDef() while native library is not ready."""
+        res = self.runDef(*args)
+        if scale != 1:
+            res = res * scale
+        if type(dst) == type(None):
+            return res
+        dst[...] = res
+        return dst
 
     def runDef(self):
         raise NotImplementedError()
@@ -119,8 +795,56 @@ class SWSolver:
     def _writeScript(self, script_file):
         raise NotImplementedError()
     
+    def _outputBase(self):
+        """Base name, without extension, of source file written by SPIRAL script."""
+        if self._scriptOutDir == None:
+            return self._namebase
+        # forward slashes are safe in SPIRAL strings on all platforms
+        return os.path.join(self._scriptOutDir, self._namebase).replace('\\', '/')
+    
+    def _scriptText(self):
+        """Trace, once per solver, and return the body of the SPIRAL script."""
+        if not self._traced:
+            with self._timed('trace'):
+                self._trace()
+            self._traced = True
+        with self._timed('script'):
+            return self._renderScript()
+        
+    def _keyScriptText(self):
+        """Script text the cache key is computed from.
+        
+        When the trace depends only on the problem, the call graph is
+        replaced by the solver class, a digest of its source, and the
+        problem, so finding a library in the cache does not run runDef(),
+        and changes to the traced code still change the key.
+        """
+        if not self._traceFromProblem():
+            return self._scriptText()
+        callGraph = self._callGraph
+        self._callGraph = ['Trace(' + type(self).__name__ + ', ' + _classSourceDigest(type(self)) + ', ' +
+                           json.dumps(vars(self._problem), sort_keys=True, default=str) + ')']
+        try:
+            with self._timed('script'):
+                return self._renderScript()
+        finally:
+            self._callGraph = callGraph
+            
+    def _traceFromProblem(self):
+        """True if the traced call graph is a function of the solver class and problem only."""
+        return False
+        
+    def _renderScript(self):
+        """Return the body of the SPIRAL script from the current trace."""
+        script_file = io.StringIO()
+        self._writeScript(script_file)
+        return script_file.getvalue()
+    
     def _genScript(self, filename : str):
-        self._trace()
+        self._writeScriptFile(filename)
+            
+    def _writeScriptFile(self, filename : str):
+        text = self._scriptText()
         try:
             script_file = open(filename, 'w')
         except:
@@ -131,9 +855,33 @@ class SWSolver:
         print("# SPIRAL script generated by " + type(self).__name__, file = script_file)
         print('# ' + timestr, file = script_file)
         print(file = script_file)
-        self._writeScript(script_file)
+        script_file.write(text)
         script_file.close()
         
+    def _needsTuning(self):
+        """True if the autotune option is set and there is no wisdom for this solver yet."""
+        if not self._opts.get(SW_OPT_AUTOTUNE, False) or self._opts.get(SW_OPT_RULES) != None:
+            return False
+        return lookupWisdom(self._wisdomSearch) == None
+        
+    def _writeCodegenOpts(self, script_file):
+        """Write code generation choices, after SPIRAL opts are created."""
+        if self._reentrant:
+            # temporaries in per-thread static arrays, the C runtime allocates
+            # them on the heap for each thread that calls, not on its stack
+            print('opts.arrayBufModifier := "static _Thread_local";', file = script_file)
+        if self._threads > 1:
+            # parallelize outer loops across threads with OpenMP
+            print('opts.tags := Concat([AParSMP(' + str(self._threads) + ')], opts.tags);', file = script_file)
+            print('Add(opts.includes, "<omp.h>");', file = script_file)
+        if self._simd != None:
+            # vectorize with the SIMD instruction set's registers
+            single = self._opts.get(SW_OPT_REALCTYPE) == "float"
+            isa = _SIMD_SPIRAL_ISA[self._simd][1 if single else 0]
+            print('opts.tags := Concat([AVecReg(' + isa + ')], opts.tags);', file = script_file)
+        for stmt in self._rules:
+            print(stmt, file = script_file)
+        
     def _writePrintOpts(self, script_file):
         if self._printRuleTree:
             print("opts.printRuleTree := true;", file = script_file)
@@ -148,8 +896,13 @@ class SWSolver:
     def _buildMetadata(self):
         md = self._metadata
         md[SW_KEY_SPIRALBUILDINFO] = spiralBuildInfo()
-        funcmeta = dict()
+        funcmeta = self._functionMetadata()
         md[SW_KEY_TRANSFORMS] = [ funcmeta ]
+        md[SW_KEY_TRANSFORMTYPES] = [ funcmeta.get(SW_KEY_TRANSFORMTYPE) ]
+        
+    def _functionMetadata(self):
+        """Metadata describing this solver's function in a library."""
+        funcmeta = dict()
         funcmeta[SW_KEY_DIRECTION]  = SW_STR_INVERSE if self._problem.direction() == SW_INVERSE else SW_STR_FORWARD
         funcmeta[SW_KEY_PRECISION] = SW_STR_SINGLE if self._opts.get(SW_OPT_REALCTYPE) == "float" else SW_STR_DOUBLE
         funcmeta[SW_KEY_TRANSFORMTYPE] = SW_TRANSFORM_UNKNOWN
@@ -161,12 +914,44 @@ class SWSolver:
         names[SW_KEY_INIT] = self._initFuncName
         names[SW_KEY_DESTROY] = 'destroy_' + self._namebase
         self._setFunctionMetadata(funcmeta)
-        md[SW_KEY_TRANSFORMTYPES] = [ funcmeta.get(SW_KEY_TRANSFORMTYPE) ]
+        self._setBuildMetadata(funcmeta, False)
+        return funcmeta
+        
+    def _setBuildMetadata(self, obj, forSearch):
+        """Add build variant keys, for searches a None value requires the key be absent."""
+        if self._compileProfile != SW_PROFILE_PORTABLE:
+            obj[SW_KEY_COMPILEPROFILE] = self._compileProfile
+        elif forSearch:
+            obj[SW_KEY_COMPILEPROFILE] = None
+        if self._nativeTarget != None:
+            obj[SW_KEY_NATIVETARGET] = self._nativeTarget
+        elif forSearch:
+            obj[SW_KEY_NATIVETARGET] = None
+        if self._threads > 1:
+            obj[SW_KEY_THREADS] = self._threads
+        elif forSearch:
+            obj[SW_KEY_THREADS] = None
+        if self._simd != None:
+            obj[SW_KEY_SIMD] = self._simd
+        elif forSearch:
+            obj[SW_KEY_SIMD] = None
+        if self._normalized():
+            obj[SW_KEY_NORMALIZED] = True
+        elif forSearch:
+            obj[SW_KEY_NORMALIZED] = None
+        if self._inplace:
+            obj[SW_KEY_INPLACE] = True
+        elif forSearch:
+            obj[SW_KEY_INPLACE] = None
+        if self._reentrant:
+            obj[SW_KEY_REENTRANT] = True
+        elif forSearch:
+            obj[SW_KEY_REENTRANT] = None
     
-    def _createMetadataFile(self, basename):
+    def _createMetadataFile(self, basename, builddir):
         """Write metadata source file."""
         varname  = basename + SW_METAVAR_EXT
-        filename = basename + SW_METAFILE_EXT
+        filename = os.path.join(builddir, basename + SW_METAFILE_EXT)
         self._buildMetadata()
         writeMetadataSourceFile(self._metadata, varname, filename) 
 
@@ -178,96 +963,191 @@ class SWSolver:
         funcmeta[SW_KEY_DIMENSIONS] = self._problem.dimensions()
         funcmeta[SW_KEY_PLATFORM] = self._opts.get(SW_OPT_PLATFORM, SW_CPU)
         self._setFunctionMetadata(funcmeta)
+        self._setBuildMetadata(funcmeta, True)
         return funcmeta
 
-    def _callSpiral(self, script):
-        """Run SPIRAL with script as input."""
+    def _callSpiral(self, script, builddir):
+        """Run SPIRAL with script as input, in builddir."""
         if self._genCuda:
             print ( 'Generating CUDA', flush = True )
         elif self._genHIP:
             print ( 'Generating HIP', flush = True )
         else:
             print ( 'Generating C', flush = True )
-        return callSpiralWithFile(script)
+        if spiralSessionPool() != None:
+            # warm session has its own working directory, so write output by full path
+            self._scriptOutDir = builddir
+            try:
+                text = self._scriptText()
+            finally:
+                self._scriptOutDir = None
+            with self._timed('spiral'):
+                return callSpiralWithSession(text)
+        with self._timed('spiral'):
+            return callSpiralWithFile(script, builddir)
+        
+    def _runCommand(self, cmd):
+        """Run command (list of args), print its stderr on failure."""
+        runResult = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if runResult.returncode != 0:
+            print(runResult.stderr.decode(), file=sys.stderr)
+        return runResult.returncode
 
-    def _callCMake (self, basename):
+    def _callCMake (self, basename, builddir, installdir, roots=None):
         ##  Assumes:  SPIRAL_HOME is defined (environment variable) or override on command line
         ##  FILEROOT = basename;
+        ##  roots, if given, are the root names of generated sources for a multi-transform library
         
         print("Compiling and linking");
         
-        # copy module CMakeLists to current directory
+        # copy module CMakeLists to build directory, configure into a subdirectory
         module_dir = os.path.dirname(__file__)
         cmfile = os.path.join(module_dir, 'CMakeLists.txt')
-        shutil.copy(cmfile, os.getcwd())
+        shutil.copy(cmfile, builddir)
+        bindir = os.path.join(builddir, 'build')
 
-        cmake_defroot = '-DFILEROOT:STRING=' + basename
-        
-        cmd = 'cmake ' + cmake_defroot
+        cmd = ['cmake', '-S', builddir, '-B', bindir, '-DFILEROOT:STRING=' + basename]
         if self._genCuda:
-            cmd += ' -DHASCUDA=1'
+            cmd += ['-DHASCUDA=1']
         elif self._genHIP:
-            cmd += ' -DHASHIP=1 -DCMAKE_CXX_COMPILER=hipcc'    
+            cmd += ['-DHASHIP=1', '-DCMAKE_CXX_COMPILER=hipcc']
             
         if self._withMPI:
-            cmd += ' -DHASMPI=1'
+            cmd += ['-DHASMPI=1']
             
         if self._includeMetadata:
-            cmd += ' -DHAS_METADATA=1'
+            cmd += ['-DHAS_METADATA=1']
 
-        cmd += ' -DPY_LIBS_DIR=' + self._libsDir
+        if roots != None:
+            cmd += ['-DSOURCE_ROOTS=' + ';'.join(roots)]
+            
+        if not (self._genCuda or self._genHIP):
+            cmd += ['-DSW_COMPILE_FLAGS=' + ';'.join(self._compileFlags(roots))]
+
+        cmd += ['-DPY_LIBS_DIR=' + installdir]
         
-        if sys.platform == 'win32':
-            ##  NOTE: Ensure Python installed on Windows is 64 bit
-            cmd += ' . && cmake --build . --config Release --target install'
-        else:
-            cmd += ' . && make install'
+        with self._timed('cmake_configure'):
+            ret = self._runCommand(cmd)
+        if ret != 0:
+            return ret
+        
+        ##  NOTE: On Windows ensure Python installed is 64 bit
+        cmd = ['cmake', '--build', bindir, '--config', 'Release']
+        with self._timed('cmake_build'):
+            ret = self._runCommand(cmd)
+        if ret != 0:
+            return ret
+        
+        with self._timed('cmake_install'):
+            return self._runCommand(cmd + ['--target', 'install'])
             
-        runResult = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if runResult.returncode != 0:
-            print(runResult.stderr.decode(), file=sys.stderr)
+    def _callCompiler(self, basename, builddir, installdir, roots=None):
+        """Compile directly with the cached toolchain, return None if not usable."""
+        if self._genCuda or self._genHIP or self._withMPI:
+            return None
+        toolchain = probeToolchain(self._libsDir)
+        if toolchain == None:
+            return None
         
-        return runResult.returncode
+        print("Compiling and linking");
+        
+        flags = self._compileFlags(roots)
+        if roots == None:
+            roots = [basename]
+        sources = [os.path.join(builddir, root + '.c') for root in roots]
+        if self._includeMetadata:
+            sources.append(os.path.join(builddir, basename + SW_METAFILE_EXT))
+        libpath = os.path.join(installdir, 'lib' + basename + SW_SHLIB_EXT)
+        with self._timed('compile'):
+            return compileLibrary(toolchain, sources, libpath, flags)
             
-    def _setupCFuncs(self, basename):
-        # if workdir specified, cd to it
+    def _compileFlags(self, roots=None):
+        """Compiler and linker flags for compile profile and SIMD instruction set.
+        
+        Multi-transform libraries, with roots, are compiled with -fno-common,
+        so globals of the same name in two transforms fail to link instead
+        of being merged into one.
+        """
+        flags = profileFlags(self._compileProfile) + simdFlags(self._simd)
+        if roots != None:
+            flags = flags + ['-fno-common']
+        return flags
+        
+    def _compile(self, basename, builddir, installdir, roots=None):
+        """Compile generated sources with selected backend, return path of built library."""
+        ret = None
+        if self._builder == SW_BUILDER_DIRECT:
+            ret = self._callCompiler(basename, builddir, installdir, roots)
+            if ret != 0:
+                print('Direct compile not available, falling back to CMake', file=sys.stderr)
+                ret = None
+        if ret == None:
+            ret = self._callCMake(basename, builddir, installdir, roots)
+        
+        if ret != 0:
+            msg = "CMake error"
+            raise RuntimeError(msg)
+        
+        return os.path.join(installdir, 'lib' + basename + SW_SHLIB_EXT)
+            
+    def _makeBuildDir(self, basename):
+        """Create temporary build directory under workdir if specified, otherwise under current directory."""
+        parentdir = os.getcwd()
         if self._workdir != None:
-            try:
-                os.chdir(self._workdir)
-            except:
+            if os.path.isdir(self._workdir):
+                parentdir = self._workdir
+            else:
                 print('Could not find workdir "' + str(self._workdir) + '". Using current directory.')
-    
-        # create temporary build directory and cd to it
-        cwd = os.getcwd()
-        tempdir = tempfile.mkdtemp(None, basename + '_', cwd)
-        os.chdir(tempdir)
-    
-        script = basename + ".g"
+        return tempfile.mkdtemp(None, basename + '_', parentdir)
+            
+    def _setupCFuncs(self, basename):
+        """Build library unless another thread or process has, return its path."""
+        libname = cachedLibraryName(self._namebase, self._cacheKey)
+        lockStart = time.perf_counter()
+        with buildLock(publishDir(self._libsDir), libname):
+            self._buildStats['lock_wait'] = time.perf_counter() - lockStart
+            # may have been published while waiting for the lock
+            libpath = findCachedLibrary(self._namebase, self._cacheKey, cacheDirs(self._libsDir))
+            if libpath != None:
+                return libpath
+            return self._buildLibrary(basename)
+            
+    def _buildLibrary(self, basename):
+        """Generate, compile, and publish library, return path to published library."""
+        # create temporary build directory, all build steps use explicit paths
+        tempdir = self._makeBuildDir(basename)
+        try:
+            return self._buildInDir(basename, tempdir)
+        finally:
+            # optionally remove temp dir, also after a failed build
+            if (not self._keeptemp):
+                shutil.rmtree(tempdir, ignore_errors=True)
+            
+    def _buildInDir(self, basename, tempdir):
+        """Generate, compile, and publish library, working in tempdir."""
+        script = os.path.join(tempdir, basename + ".g")
         self._genScript(script)
-        ret = self._callSpiral(script)
+        ret = self._callSpiral(script, tempdir)
         if ret == SPIRAL_RET_OK:
+            self._checkGenerated(tempdir)
             if self._includeMetadata:
-                self._createMetadataFile(basename)
+                self._createMetadataFile(basename, tempdir)
         else:
-            # return to original working directory and raise error
-            os.chdir(cwd)
             msg = 'SPIRAL error'
             raise RuntimeError(msg)
         
-        ret = self._callCMake(basename)
-        
-        # return to original working directory
-        os.chdir(cwd)
-        
-        if ret != 0:
-            msg = "CMake error"
-            raise RuntimeError(msg)
-        
-        # optionally remove temp dir
-        if (not self._keeptemp):
-            shutil.rmtree(tempdir, ignore_errors=True)
+        # install into the build directory, then publish to the cache
+        installdir = os.path.join(tempdir, 'install')
+        builtlib = self._compile(basename, tempdir, installdir)
+        if self._reentrant and not self._checkReentrant(builtlib, tempdir) and self._includeMetadata:
+            # metadata must not claim Reentrant
+            self._createMetadataFile(basename, tempdir)
+            builtlib = self._compile(basename, tempdir, installdir)
+        libname = cachedLibraryName(self._namebase, self._cacheKey)
+        with self._timed('publish'):
+            libpath = publishLibrary(builtlib, publishDir(self._libsDir), libname)
         
-        return
+        return libpath
         
     def buildTestInput(self):
         raise NotImplementedError()
@@ -282,16 +1162,6 @@ class SWSolver:
         for i in range(len(self._callGraph)-1):
             self._callGraph[i] = self._callGraph[i] + ','
 
-    def _initFunc(self):
-        """Call the SPIRAL generated init function"""
-        gf = getattr(self._SharedLibAccess, self._initFuncName, None)
-        if gf != None:
-            ##  print ( 'SWSolver._initFunc: found init_' + self._namebase, flush = True )
-            return gf()
-        else:
-            msg = 'could not find function: ' + self._initFuncName
-            raise RuntimeError(msg)
-
     def _func(self, dst, src):
         """Call the SPIRAL generated main function"""
         
@@ -312,16 +1182,6 @@ class SWSolver:
             dstdev = ctypes.cast(dst.data.ptr, ctypes.POINTER(ctypes.c_void_p))
             return self._MainFunc(dstdev, srcdev)
 
-        
-    def _destroyFunc(self):
-        """Call the SPIRAL generated destroy function"""
-        gf = getattr(self._SharedLibAccess, self._destroyFuncName, None)
-        if gf != None:
-            return gf()
-        else:
-            msg = 'could not find function: ' + self._destroyFuncName
-            raise RuntimeError(msg)
-
     def zeroEmbedBox(self, src, padding):
         xp = sw.get_array_module(src)
         retCube = xp.pad(src, padding)